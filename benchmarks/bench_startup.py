@@ -0,0 +1,70 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# Measures the startup time of the toolbelt commands (`--help`) and lists the heavy
+# dependencies each of them imports. With --json the results are appended to a file,
+# one JSON object per run, to track them over time; --max-ms fails the run on a regression.
+
+import argparse
+import datetime
+import json
+from pathlib import Path
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+TOOLBELT = str(Path(__file__).parent.parent.resolve() / 'toolbelt.py')
+COMMANDS = [[], ['pcap'], ['sarif'], ['sbom', 'check'], ['sbom', 'check-server'], ['sbom', 'update'], ['sbom', 'unify'], ['sbom', 'csv'],
+            ['sbom', 'odt'], ['sbom', 'export'], ['sbom', 'registry-import']]
+HEAVY_MODULES = ('scapy', 'jsonschema', 'referencing', 'requests', 'asyncio')
+
+def run_time(argv):
+    start = time.perf_counter()
+    subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def imported_heavy_modules(argv):
+    res = subprocess.run([argv[0], '-X', 'importtime'] + argv[1:], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                         universal_newlines=True)
+    found = set()
+    for line in res.stderr.splitlines():
+        if line.startswith('import time:') and line.count('|') == 2:
+            name = line.rsplit('|', 1)[1].strip().split('.', 1)[0]
+            if name in HEAVY_MODULES:
+                found.add(name)
+    return sorted(found)
+
+parser = argparse.ArgumentParser(description='замер времени запуска команд toolbelt.py')
+parser.add_argument('-n', '--runs', type=int, default=10, help='число запусков каждой команды; по умолчанию 10')
+parser.add_argument('--json', metavar='FILE', help='дописать результаты в FILE (JSON Lines)')
+parser.add_argument('--max-ms', type=float, default=0, help='завершиться с ошибкой, если медиана запуска какой-либо команды больше заданной')
+args = parser.parse_args()
+
+baseline = statistics.median(run_time([sys.executable, '-c', 'pass']) for _ in range(args.runs))
+print(f'{"python -c pass":30} {baseline * 1000:7.1f} мс')
+results = dict()
+for command in COMMANDS:
+    argv = [sys.executable, TOOLBELT] + command + ['--help']
+    median = statistics.median(run_time(argv) for _ in range(args.runs))
+    modules = imported_heavy_modules(argv)
+    name = ' '.join(['toolbelt'] + command)
+    results[name] = {'ms': round(median * 1000, 1), 'heavy_modules': modules}
+    print(f'{name:30} {median * 1000:7.1f} мс  {", ".join(modules)}')
+
+if args.json:
+    record = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'host': platform.node(),
+        'baseline_ms': round(baseline * 1000, 1),
+        'commands': results,
+    }
+    with open(args.json, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+slow = [name for name, result in results.items() if args.max_ms and result['ms'] > args.max_ms]
+if slow:
+    print(f'ERROR: дольше {args.max_ms} мс: {", ".join(slow)}')
+    sys.exit(1)
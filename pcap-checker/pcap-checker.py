@@ -2,9 +2,14 @@ import sys
 import glob
 import os
 import argparse
-from scapy.all import PcapReader, IP
 from datetime import datetime
 
+try:
+    from toolbelt_profile import stage
+except ImportError: # запуск без toolbelt.py, замеры не выполняются
+    from contextlib import nullcontext
+    stage = lambda name: nullcontext()
+
 def canonical_ip(ip_str):
     """Приводит IP-адрес к каноническому виду (убирает ведущие нули)"""
     try:
@@ -75,12 +80,14 @@ def group_ips_by_range(ip_set):
 
 def process_pcap(file_path, white_list_dict=None):
     """Обрабатывает pcap-файл и анализирует IP-адреса"""
+    # scapy.all импортируется около секунды, поэтому только когда есть файл для разбора
+    from scapy.all import PcapReader, IP
     try:
         unique_ips = set()
         white_ips_in_file = {}
         non_white_ips = set()
 
-        with PcapReader(file_path) as packets:
+        with stage('read_pcap'), PcapReader(file_path) as packets:
             for pkt in packets:
                 if IP in pkt:
                     src = pkt[IP].src
@@ -224,4 +231,5 @@ if __name__ == "__main__":
                 lines.append(f"  {ip}")
         white_list_output = "\n".join(lines)
     
-    generate_report(pcap_files, white_list_dict, white_list_output)
\ No newline at end of file
+    with stage('report'):
+        generate_report(pcap_files, white_list_dict, white_list_output)
\ No newline at end of file
@@ -4,6 +4,12 @@ import os
 import glob
 from collections import Counter
 
+try:
+    from toolbelt_profile import stage
+except ImportError: # запуск без toolbelt.py, замеры не выполняются
+    from contextlib import nullcontext
+    stage = lambda name: nullcontext()
+
 def extract_comments(obj, comments_list):
     """Рекурсивно извлекает комментарии из JSON-структуры"""
     if isinstance(obj, dict):
@@ -19,16 +25,17 @@ def extract_comments(obj, comments_list):
 
 def process_sarif_file(file_path):
     """Обрабатывает один SARIF-файл и возвращает статистику комментариев"""
-    with open(file_path, 'r', encoding='utf-8') as f:
+    with stage('parse_sarif'), open(file_path, 'r', encoding='utf-8') as f:
         try:
             data = json.load(f)
         except json.JSONDecodeError:
             print(f"Ошибка: Файл {file_path} не является валидным JSON")
             return None
     
-    all_comments = []
-    extract_comments(data, all_comments)
-    return Counter(all_comments)
+    with stage('extract_comments'):
+        all_comments = []
+        extract_comments(data, all_comments)
+        return Counter(all_comments)
 
 def main():
     parser = argparse.ArgumentParser(description='Анализ комментариев в SARIF-файлах')
@@ -68,7 +75,7 @@ def main():
             print(f"  - [{count}] {comment}")
         
         # Сохраняем отчет в файл
-        with open(report_file, 'w', encoding='utf-8') as f:
+        with stage('report'), open(report_file, 'w', encoding='utf-8') as f:
             f.write(f"Отчет по файлу: {file_path}\n")
             f.write("=" * 50 + "\n")
             f.write(f"Всего уникальных комментариев: {len(counter)}\n\n")
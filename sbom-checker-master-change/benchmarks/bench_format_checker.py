@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# Compares CachedFormatChecker with the format checker of jsonschema on the strings of a
+# generated sbom and on random strings, then times the validation of the sbom with both.
+
+import argparse
+from pathlib import Path
+import random
+import sys
+import time
+
+import jsonschema
+
+from sbom_generator import generate_sbom
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from sbom_validation import CACHED_FORMATS, CachedFormatChecker, load_registry, load_schema
+
+# pieces of random strings: valid and broken parts of uris and dates
+PIECES = ['http://', 'https://', 'git+ssh://', 'pkg:', 'mailto:', '//', '%2F', '%zz', '%4', 'user@', '@', '[::1]',
+          ':8080', ':x', '/', '?', '#', 'a', '-', 'x:', ':', '.', ' ', '"', '<', '\\', '[', ']', '{', 'é', 'Ж',
+          '2024-01-01', 'T', '12:00:00', 'Z', '+03:00', '.5', '2024-02-30']
+
+def strings(obj):
+    if isinstance(obj, str):
+        yield obj
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            yield from strings(value)
+    elif isinstance(obj, list):
+        for value in obj:
+            yield from strings(value)
+
+def conforms(checker, value, format):
+    try:
+        checker.check(value, format)
+    except jsonschema.exceptions.FormatError as e:
+        return e.message
+    return None
+
+def add_broken_values(document, rnd):
+    """Invalid uris and dates in some components, so the validation reports format errors too."""
+    stack = list(document['components'])
+    while stack:
+        component = stack.pop()
+        stack += component.get('components', [])
+        if rnd.random() < 0.02:
+            component['externalReferences'][0]['url'] = rnd.choice(['http://exa mple.org/x', 'https://[x]/', 'a b'])
+        if rnd.random() < 0.01:
+            component['properties'].append({'name': 'x', 'value': 'y'})
+            component['purl'] = component['purl'] + '%zz'
+
+def time_checks(checker, values):
+    start = time.perf_counter()
+    for value in values:
+        for format in CACHED_FORMATS:
+            conforms(checker, value, format)
+    return time.perf_counter() - start
+
+def validate(validator, document):
+    start = time.perf_counter()
+    messages = [str(err) for err in validator.iter_errors(document)]
+    return messages, time.perf_counter() - start
+
+parser = argparse.ArgumentParser(description='сравнение и замер скорости проверки форматов строк в sbom-файлах')
+parser.add_argument('-n', '--count', type=int, default=5000, help='число компонентов sbom-файла; по умолчанию 5000')
+parser.add_argument('-r', '--random', type=int, default=100000, help='число случайных строк для сравнения; по умолчанию 100000')
+parser.add_argument('--seed', type=int, default=0)
+args = parser.parse_args()
+
+rnd = random.Random(args.seed)
+document = generate_sbom(args.count, seed=args.seed)
+add_broken_values(document, rnd)
+schema = load_schema('oss')
+registry = load_registry()
+cls = jsonschema.validators.validator_for(schema)
+
+values = set(strings(document))
+values.update(''.join(rnd.choice(PIECES) for _ in range(rnd.randrange(1, 10))) for _ in range(args.random))
+cached = CachedFormatChecker(cls.FORMAT_CHECKER)
+mismatches = [(value, format) for value in values for format in CACHED_FORMATS
+              if conforms(cls.FORMAT_CHECKER, value, format) != conforms(cached, value, format)]
+if mismatches:
+    for value, format in mismatches[:10]:
+        print(f'ERROR: {format} {value!r}: {conforms(cls.FORMAT_CHECKER, value, format)} != {conforms(cached, value, format)}')
+    sys.exit(1)
+print(f'результаты совпадают для {len(values)} различных строк и форматов {", ".join(CACHED_FORMATS)}')
+
+# every string of the sbom with repetitions, as the validator meets them
+doc_values = list(strings(document))
+print(f'проверка {len(doc_values)} строк sbom-файла по {len(CACHED_FORMATS)} форматам: '
+      f'FORMAT_CHECKER {time_checks(cls.FORMAT_CHECKER, doc_values):.3f} с, '
+      f'CachedFormatChecker {time_checks(CachedFormatChecker(cls.FORMAT_CHECKER), doc_values):.3f} с')
+
+plain_messages, plain_time = validate(cls(schema, format_checker=cls.FORMAT_CHECKER, registry=registry), document)
+cached = CachedFormatChecker(cls.FORMAT_CHECKER)
+validator = cls(schema, format_checker=cached, registry=registry)
+cold_messages, cold_time = validate(validator, document)
+warm_messages, warm_time = validate(validator, document)
+if not plain_messages == cold_messages == warm_messages:
+    print('ERROR: ошибки проверки различаются')
+    sys.exit(1)
+info = cached.cache_info()
+print(f'ошибок проверки: {len(plain_messages)}')
+print(f'FORMAT_CHECKER: {plain_time:.3f} с')
+print(f'CachedFormatChecker: {cold_time:.3f} с, повторно {warm_time:.3f} с')
+print(f'{info}, доля попаданий в кэш {info.hit_rate:.1%}')
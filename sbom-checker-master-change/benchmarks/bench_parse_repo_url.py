@@ -0,0 +1,133 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# Compares parse_repo_url with the previous implementation on generated urls and times both.
+# legacy_parse_repo_url and make_urls are also used by tests/test_parse_repo_url.py.
+
+import argparse
+from pathlib import Path
+import random
+import sys
+import time
+import urllib.parse
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from sbom_utils import pattern_dict, RepoUrlNormalizer
+
+def legacy_parse_repo_url(url):
+    parsed_url = urllib.parse.urlparse(url)
+    path = parsed_url.path.strip('/')
+    query = urllib.parse.parse_qs(parsed_url.query)
+    if 'commit' in query:
+        return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path), query['commit'][0]
+    if 'tag' in query:
+        return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path), query['tag'][0]
+    if parsed_url.netloc == 'git.altlinux.org':
+        query = urllib.parse.parse_qs(parsed_url.query, separator=';')
+        fpath = ''
+        commit = ''
+        if 'f' in query:
+            fpath = query['f'][0]
+        if 'h' in query:
+            commit = query['h'][0]
+        elif 'hb' in query:
+            commit = query['hb'][0]
+        if fpath:
+            if not commit:
+                commit = 'HEAD'
+            return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path), commit+'/'+fpath
+        else:
+            return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path), commit
+    if parsed_url.netloc == 'git.netfilter.org':
+        query = urllib.parse.parse_qs(parsed_url.query)
+        commit = ''
+        if 'id' in query:
+            commit = query['id'][0]
+        elif 'h' in query:
+            commit = query['h'][0]
+        path_split = path.split('/')
+        if len(path_split) <= 2:
+            return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path_split[0]), commit
+        if not commit:
+            commit = 'HEAD'
+        return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path_split[0]), commit+'/'+'/'.join(path_split[2:])
+    path_pair_list = []
+    path_split = path.split('/')
+    for idx in range(len(path_split) - 1):
+        path_pair_list.append((path_split[idx], path_split[idx+1]))
+    idx = -1
+    flag = 0
+    prefix = 2
+    if parsed_url.netloc in pattern_dict:
+        prefix = pattern_dict[parsed_url.netloc][2]
+        for s in pattern_dict[parsed_url.netloc][0]:
+            if len(path_pair_list) > prefix and s in path_pair_list[prefix:]:
+                idx = path_pair_list[prefix:].index(s) + prefix
+                flag = 1
+                break
+        else:
+            for s in pattern_dict[parsed_url.netloc][1]:
+                if len(path_split) > prefix and s in path_split[prefix:]:
+                    idx = path_split[prefix:].index(s) + prefix
+                    break
+    else:
+        for s in [('-', 'commit'), ('-', 'commits'), ('-', 'tags'), ('-', 'tree'), ('-', 'blob'), ('-', 'releases'), ('releases', 'tag')]:
+            if s in path_pair_list[prefix:]:
+                idx = path_pair_list[prefix:].index(s) + prefix
+                flag = 1
+                break
+        else:
+            for s in ['commit', 'blob', 'tree']:
+                if s in path_split[prefix:]:
+                    idx = path_split[prefix:].index(s) + prefix
+                    break
+    if idx > 0:
+        return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + '/'.join(path_split[:idx])), '/'.join(path_split[idx+1+flag:])
+    return None
+
+SEGMENTS = ['-', 'commit', 'commits', 'tags', 'tree', 'blob', 'releases', 'tag', 'src', 'branch', 'file', 'rev',
+            'shortlog', 'main', 'v1.0', 'README.md', 'lib', 'org', 'repo', '']
+HOSTS = list(pattern_dict) + ['gitlab.com', 'git.altlinux.org', 'git.netfilter.org', 'example.org']
+QUERIES = ['', 'commit=abc', 'tag=v1', 'h=deadbeef', 'id=1234', 'p=x.git;a=blob;f=a/b.c;hb=v2', 'f=x;h=1', 'hb=5']
+
+def make_urls(count, distinct, seed):
+    rnd = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        path = '/'.join(rnd.choice(SEGMENTS) for _ in range(rnd.randint(0, 8)))
+        query = rnd.choice(QUERIES)
+        pool.append(f'https://{rnd.choice(HOSTS)}/{path}' + (f'?{query}' if query else ''))
+    return [rnd.choice(pool) for _ in range(count)]
+
+def timeit(func, urls):
+    start = time.perf_counter()
+    for url in urls:
+        func(url)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='сравнение и замер скорости parse_repo_url')
+    parser.add_argument('-n', '--count', type=int, default=200000, help='число url; по умолчанию 200000')
+    parser.add_argument('-d', '--distinct', type=int, default=5000, help='число различных url; по умолчанию 5000')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    urls = make_urls(args.count, args.distinct, args.seed)
+    normalizer = RepoUrlNormalizer()
+    mismatches = [url for url in set(urls) if legacy_parse_repo_url(url) != normalizer.normalize(url)]
+    if mismatches:
+        for url in mismatches[:10]:
+            print(f'ERROR: {url}: {legacy_parse_repo_url(url)} != {normalizer.normalize(url)}')
+        sys.exit(1)
+    print(f'результаты совпадают для {len(set(urls))} различных url')
+
+    legacy_time = timeit(legacy_parse_repo_url, urls)
+    cold = RepoUrlNormalizer(cache_size=0)
+    cold_time = timeit(cold.normalize, urls)
+    warm = RepoUrlNormalizer()
+    start = time.perf_counter()
+    warm.normalize_many(urls)
+    batch_time = time.perf_counter() - start
+    print(f'прежняя реализация: {legacy_time:.3f} с')
+    print(f'без кеша: {cold_time:.3f} с')
+    print(f'normalize_many: {batch_time:.3f} с ({warm.cache_info()})')
@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: 2024 Artem Irkhin
+# SPDX-License-Identifier: Apache-2.0
+
+# Compares the csv export with the previous implementation on a generated sbom and times both.
+
+import argparse
+import csv
+import filecmp
+from pathlib import Path
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from sbom_export import CSV_HEADER, write_csv
+from sbom_utils import ComponentTree, get_prop
+
+def legacy_write_csv(components, filename):
+    # the previous sbom-to-csv.py loop; its dedup key held a dict and could not be hashed,
+    # here the dict is replaced by its items to let it run
+    with open(filename, 'w', newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+    stack = list(components)
+    idx = 1
+    added_elements = set()
+    while stack:
+        component = stack.pop(0)
+        stack += component.get('components', [])
+        ext_refs = component.get('externalReferences')
+        urls = ''
+        if ext_refs:
+            for item in ext_refs:
+                if item['type'] == 'vcs':
+                    urls+=f'Репозиторий: {item["url"]}\n'
+                elif item['type'] == 'website':
+                    urls+=f'Адрес веб-ресурса компонента: {item["url"]}\n'
+                else:
+                    urls+=f'Иное: {item["url"]}\n'
+        special_function = {"GOST:attack_surface":"yes/indirect/no", "GOST:security_function":"yes/indirect/no"}
+        attack_surface = get_prop(component.get('properties', []), 'GOST:attack_surface')
+        if attack_surface in ['yes', 'indirect', 'no']: special_function["GOST:attack_surface"] = attack_surface
+        security_function = get_prop(component.get('properties', []), 'GOST:security_function')
+        if security_function in ['yes', 'indirect', 'no']: special_function["GOST:security_function"] = security_function
+        element = (component['name'], component['version'], get_prop(component.get('properties', []), 'source_langs'), tuple(special_function.items()), urls)
+        if element in added_elements:
+            continue
+        added_elements.add(element)
+        with open(filename, 'a', newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow([idx, component['name'], component['version'], get_prop(component.get('properties', []), 'source_langs'), special_function, urls])
+        idx += 1
+
+def make_components(count, seed):
+    rnd = random.Random(seed)
+    components = []
+    parents = [components]
+    for i in range(count):
+        n = rnd.randrange(count // 4 + 1) # about a quarter of the rows repeat
+        component = {
+            'type': 'library',
+            'name': f'lib{n}',
+            'version': f'1.{n % 7}',
+            'properties': [
+                {'name': 'GOST:attack_surface', 'value': rnd.choice(['yes', 'indirect', 'no', ''])},
+                {'name': 'GOST:security_function', 'value': rnd.choice(['yes', 'no'])},
+                {'name': 'source_langs', 'value': rnd.choice(['C', 'C++', 'Python', 'Go'])},
+            ],
+            'externalReferences': [{'type': rnd.choice(['vcs', 'website', 'other']), 'url': f'https://example.org/lib{n}'}],
+        }
+        rnd.choice(parents[-50:]).append(component)
+        if rnd.random() < 0.2:
+            component['components'] = []
+            parents.append(component['components'])
+    return components
+
+parser = argparse.ArgumentParser(description='сравнение и замер скорости экспорта в csv')
+parser.add_argument('-n', '--count', type=int, default=50000, help='число компонентов; по умолчанию 50000')
+parser.add_argument('--seed', type=int, default=0)
+args = parser.parse_args()
+
+components = make_components(args.count, args.seed)
+with tempfile.TemporaryDirectory() as tmp:
+    legacy_csv = Path(tmp) / 'legacy.csv'
+    new_csv = Path(tmp) / 'new.csv'
+    start = time.perf_counter()
+    legacy_write_csv(components, legacy_csv)
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    write_csv(ComponentTree(components), new_csv)
+    new_time = time.perf_counter() - start
+    if not filecmp.cmp(legacy_csv, new_csv, shallow=False):
+        print('ERROR: результаты различаются')
+        sys.exit(1)
+print(f'результаты совпадают для {args.count} компонентов')
+print(f'прежняя реализация: {legacy_time:.3f} с')
+print(f'write_csv: {new_time:.3f} с')
@@ -0,0 +1,144 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# Compares the odt export with the previous odfpy implementation on a generated sbom and times both.
+# The previous implementation needs odfpy (pip install -r benchmarks/requirements.txt);
+# without it only write_odt is timed.
+
+import argparse
+import importlib.util
+from pathlib import Path
+import random
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from sbom_export import get_ext_ref, ODT_TEMPLATES, special_function_text, write_odt
+from sbom_utils import ComponentTree
+
+NS = {
+    'table': 'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
+    'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
+    'style': 'urn:oasis:names:tc:opendocument:xmlns:style:1.0',
+}
+
+def legacy_write_odt(tree, filename, sbom_format, pa_fb_ontop):
+    # the previous sbom-to-odt.py, building the odfpy document in memory
+    from odf.opendocument import load
+    from odf.table import Table, TableRow, TableCell
+    from odf.text import P
+    from odf.style import TextProperties
+    pa_fb_key = lambda i: (tree.get_prop(i, 'GOST:attack_surface') in {'yes', 'indirect'},
+                           tree.get_prop(i, 'GOST:security_function') in {'yes', 'indirect'})
+    idx = 1
+    added_elements = set()
+    if sbom_format == 'oss':
+        doc = load(ODT_TEMPLATES / 'template.odt')
+        table, row_style, cell_style = doc.getElementsByType(Table)[0], 'Table3.1', 'Table3.A1'
+        text_style = 'P3'
+        indices = list(tree.indices())
+    else:
+        doc = load(ODT_TEMPLATES / 'template_container.odt')
+        table, row_style, cell_style = doc.getElementsByType(Table)[0], 'Table2', 'Table2.A1'
+        text_style = doc.getStyleByName('P4')
+        text_style.addElement(TextProperties(attributes={'fontsize':"10pt"}))
+        indices = range(tree.top_count)
+    if pa_fb_ontop:
+        indices = sorted(indices, key=pa_fb_key, reverse=True)
+    for i in indices:
+        comp = tree.components[i]
+        if sbom_format == 'oss':
+            element = (comp.get('name', ''), comp.get('version', ''), tree.get_prop(i, 'source_langs'),
+                       tree.get_prop(i, 'GOST:attack_surface'), tree.get_prop(i, 'GOST:security_function'),
+                       get_ext_ref(comp.get('externalReferences', [])))
+            if element in added_elements:
+                continue
+            added_elements.add(element)
+            cells = element[:3] + (special_function_text(element[3], element[4]), element[5])
+        else:
+            deps = dict()
+            for j in tree.descendants(i):
+                dep = tree.components[j]
+                deps[dep.get('name', '') + ' ' + dep.get('version', '')] = None
+            cells = (comp.get('name', ''), comp.get('description', ''), '\n'.join(deps),
+                     special_function_text(tree.get_prop(i, 'GOST:attack_surface'), tree.get_prop(i, 'GOST:security_function')))
+        tr = TableRow(stylename=row_style)
+        for text in (str(idx),) + cells:
+            tc = TableCell(stylename=cell_style)
+            tc.addElement(P(text=text, stylename=text_style))
+            tr.addElement(tc)
+        table.addElement(tr)
+        idx += 1
+    doc.save(filename)
+
+def document_view(filename):
+    """What the document shows: the table rows with their styles and the used styles of content.xml."""
+    with zipfile.ZipFile(filename) as z:
+        root = ET.fromstring(z.read('content.xml'))
+    rows = []
+    for row in root.iter(f'{{{NS["table"]}}}table-row'):
+        rows.append([row.get(f'{{{NS["table"]}}}style-name')] +
+                    [(cell.get(f'{{{NS["table"]}}}style-name'), ''.join(p.get(f'{{{NS["text"]}}}style-name') or '' for p in cell),
+                      ''.join(cell.itertext())) for cell in row])
+    # odfpy dropped automatic styles nothing refers to, they don't change the document
+    used = {value for element in root.iter() for name, value in element.attrib.items() if name.endswith('style-name')}
+    styles = [ET.tostring(style) for style in root.iter(f'{{{NS["style"]}}}style') if style.get(f'{{{NS["style"]}}}name') in used]
+    return rows, sorted(styles)
+
+def make_components(count, seed):
+    rnd = random.Random(seed)
+    components = []
+    parents = [components]
+    for i in range(count):
+        n = rnd.randrange(count // 4 + 1) # about a quarter of the rows repeat
+        component = {
+            'type': 'library',
+            'name': f'lib{n} <&>',
+            'version': f'1.{n % 7}',
+            'description': f'image {n}',
+            'properties': [
+                {'name': 'GOST:attack_surface', 'value': rnd.choice(['yes', 'indirect', 'no', ''])},
+                {'name': 'GOST:security_function', 'value': rnd.choice(['yes', 'indirect', 'no'])},
+                {'name': 'source_langs', 'value': rnd.choice(['C', 'C++', 'Python', 'Go'])},
+            ],
+            'externalReferences': [{'type': rnd.choice(['vcs', 'website', 'source-distribution']), 'url': f'https://example.org/lib{n}'}],
+        }
+        rnd.choice(parents[-50:]).append(component)
+        if rnd.random() < 0.2:
+            component['components'] = []
+            parents.append(component['components'])
+    return components
+
+parser = argparse.ArgumentParser(description='сравнение и замер скорости экспорта в odt')
+parser.add_argument('-n', '--count', type=int, default=20000, help='число компонентов; по умолчанию 20000')
+parser.add_argument('--seed', type=int, default=0)
+args = parser.parse_args()
+
+tree = ComponentTree(make_components(args.count, args.seed))
+has_odfpy = importlib.util.find_spec('odf') is not None
+if not has_odfpy:
+    print('odfpy не установлен (pip install -r benchmarks/requirements.txt), сравнение с прежней реализацией пропущено')
+with tempfile.TemporaryDirectory() as tmp:
+    for sbom_format in ('oss', 'container'):
+        for pa_fb_ontop in (False, True):
+            legacy_odt = Path(tmp) / 'legacy.odt'
+            new_odt = Path(tmp) / 'new.odt'
+            start = time.perf_counter()
+            write_odt(tree, new_odt, sbom_format, pa_fb_ontop)
+            new_time = time.perf_counter() - start
+            if not has_odfpy:
+                print(f'--format={sbom_format} --pa-fb-ontop={pa_fb_ontop}: write_odt {new_time:.3f} с')
+                continue
+            start = time.perf_counter()
+            legacy_write_odt(tree, legacy_odt, sbom_format, pa_fb_ontop)
+            legacy_time = time.perf_counter() - start
+            if document_view(legacy_odt) != document_view(new_odt):
+                print(f'ERROR: результаты различаются (--format={sbom_format}, --pa-fb-ontop={pa_fb_ontop})')
+                sys.exit(1)
+            print(f'--format={sbom_format} --pa-fb-ontop={pa_fb_ontop}: прежняя реализация {legacy_time:.3f} с, '
+                  f'write_odt {new_time:.3f} с')
+if has_odfpy:
+    print(f'результаты совпадают для {args.count} компонентов')
@@ -0,0 +1,141 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# Times the sbom tools on generated sboms and reports the peak memory of every run.
+# Registries and repositories are served by the local stand-ins of stand_ins.py, and
+# every run gets empty cache and data directories, so the results don't depend on the
+# network or on earlier runs.
+
+import argparse
+import datetime
+import json
+import os
+from pathlib import Path
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from sbom_generator import generate_sbom
+from stand_ins import stand_in_env, start_stand_ins
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from sbom_utils import write_sbom
+
+SBOM_DIR = Path(__file__).parent.parent.resolve()
+
+def scenarios(files, jobs):
+    """(name, script, arguments) of the measured runs."""
+    doc, old, out = files['doc'], files['old'], files['out']
+    runs = [
+        ('check', 'sbom-checker.py', [doc, '-e', '0']),
+        ('check --stream', 'sbom-checker.py', [doc, '-e', '0', '--stream']),
+        ('check --check-mfr', 'sbom-checker.py', [doc, '-e', '0', '--check-mfr']),
+        ('check --check-vcs', 'sbom-checker.py', [doc, '-e', '0', '--check-vcs']),
+        ('to-csv', 'sbom-to-csv.py', [doc, out + '.csv']),
+        ('to-odt', 'sbom-to-odt.py', [doc, out + '.odt']),
+        ('to-odt --format=container', 'sbom-to-odt.py', [doc, out + '.odt', '--format', 'container']),
+        ('export', 'sbom-export.py', [doc, '--csv', out + '.csv', '--odt', out + '.odt', '--jsonl', out + '.jsonl']),
+        ('update --props', 'sbom-updater.py', [doc, out + '.json', '--props']),
+        ('update --update --diff', 'sbom-updater.py', [doc, out + '.json', '--update', old, '--diff', out + '.diff.json']),
+        ('update --ref', 'sbom-updater.py', [doc, out + '.json', '--ref']),
+        ('unify', 'sbom-unifier.py', files['parts'] + [out + '.json'] + files['unify_args']),
+        ('unify --deep-merge', 'sbom-unifier.py', files['parts'] + [out + '.json', '--deep-merge'] + files['unify_args']),
+    ]
+    if jobs > 1:
+        runs.insert(1, (f'check -j {jobs}', 'sbom-checker.py', [doc, '-e', '0', '-j', str(jobs)]))
+    return runs
+
+def measure(script, arguments, env, log):
+    """Runs a script, returns (seconds, peak RSS in MB or None, exit code)."""
+    with open(log, 'w') as stderr:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, str(SBOM_DIR / script)] + arguments, env=env,
+                                stdout=subprocess.DEVNULL, stderr=stderr)
+        if hasattr(os, 'wait4'):
+            # the usage of this very child, RUSAGE_CHILDREN would give the maximum over all of them
+            _, status, usage = os.wait4(proc.pid, 0)
+            elapsed = time.perf_counter() - start
+            proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+            rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+        else:
+            proc.wait()
+            elapsed = time.perf_counter() - start
+            rss = None
+    return elapsed, rss, proc.returncode
+
+parser = argparse.ArgumentParser(description='замер времени работы и расхода памяти скриптов sbom на сгенерированных sbom-файлах')
+parser.add_argument('-n', '--count', type=int, default=20000, help='число компонентов во входном файле, включая вложенные; по умолчанию 20000')
+parser.add_argument('--depth', type=int, default=3, help='наибольшая глубина вложенности; по умолчанию 3')
+parser.add_argument('--props', type=float, default=1.0, help='доля компонентов со свойствами GOST; по умолчанию 1')
+parser.add_argument('--duplicates', type=float, default=0.1, help='доля повторяющихся пакетов; по умолчанию 0.1')
+parser.add_argument('--vcs-refs', type=int, default=1, help='число ссылок типа vcs у компонента; по умолчанию 1')
+parser.add_argument('--parts', type=int, default=8, help='число входных файлов sbom-unifier.py; по умолчанию 8')
+parser.add_argument('--latency', type=float, default=0.0, help='задержка ответов заменителей реестров и git-серверов в секундах; по умолчанию 0')
+parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='дополнительно замерить sbom-checker.py -j JOBS; по умолчанию число процессоров')
+parser.add_argument('-r', '--repeat', type=int, default=1, help='число повторов каждого замера, выводится медиана времени; по умолчанию 1')
+parser.add_argument('-k', '--only', action='append', metavar='NAME', help='замерять только сценарии, название которых содержит NAME; можно указать несколько раз')
+parser.add_argument('--json', metavar='FILE', help='дописать результаты в FILE (JSON Lines)')
+parser.add_argument('--seed', type=int, default=0)
+args = parser.parse_args()
+
+server, base = start_stand_ins(latency=args.latency)
+results = dict()
+failed = False
+with tempfile.TemporaryDirectory() as tmp:
+    tmp = Path(tmp)
+    start = time.perf_counter()
+    shape = dict(depth=args.depth, props=args.props, duplicates=args.duplicates, vcs_refs=args.vcs_refs,
+                 base_url=base)
+    files = {'doc': str(tmp / 'doc.json'), 'old': str(tmp / 'old.json'), 'out': str(tmp / 'out'), 'parts': [],
+             'unify_args': ['--app-name', 'suite', '--app-version', '1.0', '--manufacturer', 'ISPRAS']}
+    write_sbom(generate_sbom(args.count, seed=args.seed, **shape), files['doc'])
+    # the previous version: other versions, partly other packages
+    write_sbom(generate_sbom(args.count, seed=args.seed + 1, variant=1, **shape), files['old'])
+    for i in range(args.parts):
+        files['parts'].append(str(tmp / f'part{i}.json'))
+        write_sbom(generate_sbom(max(1, args.count // args.parts), seed=args.seed + 2 + i, name=f'product{i}', **shape),
+                   files['parts'][-1])
+    print(f'сгенерировано за {time.perf_counter() - start:.1f} с: {args.count} компонентов, '
+          f'{os.path.getsize(files["doc"]) / 1024 / 1024:.1f} МБ')
+
+    for name, script, arguments in scenarios(files, args.jobs):
+        if args.only and not any(part in name for part in args.only):
+            continue
+        times = []
+        peak = None
+        for i in range(args.repeat):
+            home = tmp / f'home{i}'
+            env = dict(os.environ, XDG_CACHE_HOME=str(home / 'cache'), XDG_DATA_HOME=str(home / 'data'), **stand_in_env(base))
+            log = tmp / 'stderr.txt'
+            elapsed, rss, code = measure(script, arguments, env, log)
+            if code != 0:
+                failed = True
+                print(f'ERROR: {name}: код завершения {code}\n{log.read_text()[-2000:]}')
+                break
+            times.append(elapsed)
+            if rss is not None:
+                peak = max(peak or 0, rss)
+        if len(times) != args.repeat:
+            continue
+        median = statistics.median(times)
+        results[name] = {'s': round(median, 3), 'rss_mb': round(peak, 1) if peak is not None else None}
+        print(f'{name:28} {median:8.2f} с  ' + (f'{peak:8.1f} МБ' if peak is not None else ''))
+server.shutdown()
+
+if args.json:
+    record = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'host': platform.node(),
+        'cpus': os.cpu_count(),
+        'params': {'count': args.count, 'depth': args.depth, 'props': args.props, 'duplicates': args.duplicates,
+                   'vcs_refs': args.vcs_refs, 'parts': args.parts, 'latency': args.latency, 'seed': args.seed},
+        'results': results,
+    }
+    with open(args.json, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+if failed:
+    sys.exit(1)
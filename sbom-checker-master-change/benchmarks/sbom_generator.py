@@ -0,0 +1,125 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# Deterministic generator of CycloneDX 1.6 sboms for the benchmarks: the same
+# arguments always give the same document, byte for byte.
+
+import argparse
+from pathlib import Path
+import random
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from sbom_utils import write_sbom
+
+TIMESTAMP = '2024-01-01T00:00:00Z'
+ECOSYSTEMS = ('pypi', 'npm', 'maven', 'nuget', 'gem', 'golang')
+LANGS = ('C', 'C++', 'Python', 'Go', 'Java', 'JavaScript')
+GOST_VALUES = ('yes', 'indirect', 'no')
+BASE_URL = 'https://example.org' # repositories are <base>/git/<name>, websites <base>/site/<name>
+
+def _package(rnd, n, variant=0):
+    ecosystem = ECOSYSTEMS[n % len(ECOSYSTEMS)]
+    name = f'pkg{n}'
+    version = f'{n % 5}.{(n // 5 + variant) % 10}.{rnd.randrange(3)}'
+    if ecosystem == 'maven':
+        purl = f'pkg:maven/org.example/{name}@{version}'
+    elif ecosystem == 'golang':
+        purl = f'pkg:golang/example.org/{name}@v{version}'
+    else:
+        purl = f'pkg:{ecosystem}/{name}@{version}'
+    return name, version, purl
+
+def _component(rnd, n, ref, props, vcs_refs, base_url, variant):
+    name, version, purl = _package(rnd, n, variant)
+    component = {
+        'type': 'library',
+        'bom-ref': ref,
+        'name': name,
+        'version': version,
+        'purl': purl,
+        'properties': [],
+    }
+    if rnd.random() < props:
+        component['properties'] += [
+            {'name': 'GOST:attack_surface', 'value': rnd.choice(GOST_VALUES)},
+            {'name': 'GOST:security_function', 'value': rnd.choice(GOST_VALUES)},
+            {'name': 'source_langs', 'value': rnd.choice(LANGS)},
+        ]
+    refs = [{'type': 'vcs', 'url': f'{base_url}/git/{name}' + (f'-{i}' if i else '')} for i in range(vcs_refs)]
+    refs.append({'type': 'website', 'url': f'{base_url}/site/{name}'})
+    component['externalReferences'] = refs
+    if n % 17 == 0:
+        # the manufacturer of the product itself, found by sbom-checker --check-mfr
+        component['manufacturer'] = {'name': 'ISPRAS'}
+    return component
+
+def generate_sbom(count, depth=3, props=1.0, duplicates=0.1, vcs_refs=1, seed=0, base_url=BASE_URL, variant=0, name='product'):
+    """Returns a CycloneDX 1.6 sbom of `count` components, nested up to `depth` levels.
+
+    props is the share of components with the GOST properties (the rest fail
+    validation), duplicates the share of components repeating an earlier
+    package at another place of the tree, vcs_refs the number of vcs
+    references of a component; all urls start with base_url. Packages are numbered from 0 independently of
+    the seed, so sboms of different seeds share packages; variant shifts the
+    versions, e.g. for an older sbom to --update from.
+    """
+    rnd = random.Random(seed)
+    components = []
+    # (component, depth) of components that can get nested components, None for the top level
+    parents = [(None, 0)]
+    packages = []
+    for i in range(count):
+        if packages and rnd.random() < duplicates:
+            n = rnd.choice(packages)
+        else:
+            n = len(packages)
+            packages.append(n)
+        component = _component(rnd, n, f'{name}-ref-{i}', props, vcs_refs, base_url, variant)
+        parent, level = rnd.choice(parents[-64:]) if rnd.random() < 0.5 else parents[0]
+        (parent['components'] if parent else components).append(component)
+        if level < depth and rnd.random() < 0.2:
+            component['components'] = []
+            parents.append((component, level + 1))
+    for parent, level in parents[1:]:
+        if not parent['components']:
+            del parent['components']
+    dependencies = [{'ref': f'{name}-root', 'dependsOn': [c['bom-ref'] for c in components]}]
+    return {
+        'bomFormat': 'CycloneDX',
+        'specVersion': '1.6',
+        'version': 1,
+        'metadata': {
+            'timestamp': TIMESTAMP,
+            'component': {
+                'type': 'application',
+                'bom-ref': f'{name}-root',
+                'name': name,
+                'version': '1.0',
+                'manufacturer': {'name': 'ISPRAS'},
+                'properties': [
+                    {'name': 'GOST:attack_surface', 'value': 'yes'},
+                    {'name': 'GOST:security_function', 'value': 'yes'},
+                ],
+            },
+            'manufacturer': {'name': 'ISPRAS'},
+        },
+        'components': components,
+        'dependencies': dependencies,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='генератор sbom-файлов CycloneDX 1.6 для замеров производительности')
+    parser.add_argument('output', help='выходной файл')
+    parser.add_argument('-n', '--count', type=int, default=10000, help='число компонентов, включая вложенные; по умолчанию 10000')
+    parser.add_argument('--depth', type=int, default=3, help='наибольшая глубина вложенности компонентов; по умолчанию 3')
+    parser.add_argument('--props', type=float, default=1.0, help='доля компонентов со свойствами GOST; по умолчанию 1')
+    parser.add_argument('--duplicates', type=float, default=0.1, help='доля компонентов, повторяющих уже включённый пакет; по умолчанию 0.1')
+    parser.add_argument('--vcs-refs', type=int, default=1, help='число ссылок типа vcs у компонента; по умолчанию 1')
+    parser.add_argument('--base-url', default=BASE_URL, help=f'начало ссылок на репозитории и веб-ресурсы компонентов; по умолчанию {BASE_URL}')
+    parser.add_argument('--variant', type=int, default=0, help='сдвиг версий пакетов, например для предыдущей версии перечня')
+    parser.add_argument('--name', default='product', help='название продукта; по умолчанию product')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_sbom(generate_sbom(args.count, args.depth, args.props, args.duplicates, args.vcs_refs, args.seed,
+                             args.base_url, args.variant, args.name), args.output)
@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# Local stand-ins of the network services the sbom tools use, for the benchmarks:
+# ecosyste.ms package lookup, nuget flat container, rubygems versions API and git
+# smart-HTTP discovery. Answers depend only on the package name, so runs are repeatable.
+
+import argparse
+import http.server
+import json
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+
+def _bucket(name):
+    return zlib.crc32(name.encode()) % 4
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0 # seconds added to every answer, like a remote server
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urllib.parse.urlsplit(self.path)
+        base = f'http://{self.headers.get("Host", "127.0.0.1")}'
+        ctype = 'application/json'
+        if url.path == '/eco/packages/lookup':
+            purl = urllib.parse.parse_qs(url.query).get('purl', [''])[0]
+            name = purl.split('@', 1)[0].rsplit('/', 1)[-1]
+            # a quarter of the packages is unknown, a quarter has no repository
+            if _bucket(name) == 0:
+                body = []
+            elif _bucket(name) == 1:
+                body = [{'homepage': f'{base}/site/{name}'}]
+            else:
+                body = [{'repository_url': f'{base}/git/{name}', 'homepage': f'{base}/site/{name}'}]
+            body = json.dumps(body)
+        elif url.path == '/nuget/index.json':
+            body = json.dumps({'resources': [{'@type': 'PackageBaseAddress/3.0.0', '@id': f'{base}/nuget/flat/'}]})
+        elif url.path.startswith('/nuget/flat/'):
+            ctype = 'application/xml'
+            name = url.path.split('/')[3]
+            body = (f'<package xmlns="http://schemas.microsoft.com/packaging/2013/05/nuspec.xsd"><metadata>'
+                    f'<id>{name}</id><projectUrl>{base}/site/{name}</projectUrl>'
+                    f'<repository type="git" url="{base}/git/{name}"/></metadata></package>')
+        elif url.path.startswith('/rubygems/rubygems/'):
+            name = url.path.split('/')[3]
+            body = json.dumps({'homepage_uri': f'{base}/site/{name}', 'metadata': {'source_code_uri': f'{base}/git/{name}'}})
+        elif url.path.startswith('/git/') and url.path.endswith('/info/refs') and url.query == 'service=git-upload-pack':
+            name = url.path.split('/')[2]
+            if _bucket(name) == 3:
+                self._answer(404, 'text/plain', b'not found')
+                return
+            ctype = 'application/x-git-upload-pack-advertisement'
+            body = '001e# service=git-upload-pack\n0000' \
+                   '003d0000000000000000000000000000000000000000 refs/heads/main\n0000'
+        else:
+            self._answer(404, 'text/plain', b'not found')
+            return
+        self._answer(200, ctype, body.encode())
+
+    def _answer(self, status, ctype, body):
+        self.send_response(status)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients drop their keep-alive connections when they exit
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def start_stand_ins(port=0, latency=0.0):
+    """Serves the stand-ins in a background thread, returns (server, base url)."""
+    handler = type('Handler', (StandInHandler,), {'latency': latency})
+    server = StandInServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+def stand_in_env(base):
+    """Environment variables pointing sbom-updater to the stand-ins."""
+    return {
+        'SBOM_ECOSYSTEMS_API': f'{base}/eco',
+        'SBOM_NUGET_INDEX': f'{base}/nuget/index.json',
+        'SBOM_RUBYGEMS_API': f'{base}/rubygems',
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='локальные заменители реестров пакетов и git-серверов для замеров производительности')
+    parser.add_argument('-p', '--port', type=int, default=8767, help='порт; по умолчанию 8767')
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка каждого ответа в секундах; по умолчанию 0')
+    args = parser.parse_args()
+    server, base = start_stand_ins(args.port, args.latency)
+    for name, value in stand_in_env(base).items():
+        print(f'{name}={value}')
+    print(f'ссылки на репозитории: {base}/git/<название пакета>')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,151 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import http.server
+import ipaddress
+import json
+import logging
+import os
+import socketserver
+import time
+import urllib.parse
+
+parser = argparse.ArgumentParser(description='сервер проверки sbom-файлов: схемы, валидаторы и кэши загружаются один раз при запуске, '
+                                             'запросы на проверку обрабатываются одновременно')
+parser.add_argument('--host', default='127.0.0.1', help='локальный адрес, на котором принимаются запросы; по умолчанию 127.0.0.1')
+parser.add_argument('-p', '--port', type=int, default=8765, help='порт; по умолчанию 8765')
+parser.add_argument('--socket', metavar='PATH', help='принимать запросы через Unix-сокет PATH вместо TCP-порта')
+parser.add_argument('--root', metavar='DIR', help='каталог, файлы которого (включая вложенные каталоги) можно проверять по параметру file; '
+                                                   'без него параметр file не принимается')
+parser.add_argument('--allow-check-vcs', action='store_true',
+                    help='принимать параметр check-vcs: ссылки vcs из присланных sbom-файлов проверяются на сервере командами '
+                         'git, svn, hg и curl; без него параметр check-vcs не принимается')
+parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                    help='число процессов для проверки по схеме; по умолчанию число процессоров; 0 — проверка в потоках сервера')
+parser.add_argument('-v', '--verbose', action='store_true', help='подробный вывод')
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def root_file(root, name):
+    """Real path of a file under the --root directory; PermissionError for any other file."""
+    if root is None:
+        raise PermissionError('file is not accepted without --root')
+    path = os.path.realpath(os.path.join(root, name))
+    # realpath resolves symbolic links and '..', so the file can't escape the root through them
+    if os.path.commonpath([root, path]) != root:
+        raise PermissionError(f'file outside of the root directory: {name}')
+    return path
+
+class CheckHandler(http.server.BaseHTTPRequestHandler):
+    """POST /check?format=oss&errors=10&check-mfr&find-purl=PURL&check-vcs&check-vcs-leaf-only[&file=PATH]
+
+    The sbom is the request body, or with `file` a file under the --root
+    directory of the server, PATH relative to it. `check-vcs` runs the vcs
+    clients on the server and needs --allow-check-vcs. The
+    options are those of sbom-checker.py; the answer is CheckResult.as_dict()
+    as JSON, its "output" is what sbom-checker.py would print.
+    GET /health answers once the server is ready.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path == '/health':
+            self._answer(200, {'status': 'ok'})
+        else:
+            self._answer(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if url.path != '/check':
+            self._answer(404, {'error': 'not found'})
+            return
+        query = urllib.parse.parse_qs(url.query, keep_blank_values=True)
+        flag = lambda name: query.get(name, ['0'])[-1].lower() not in ('0', 'false', 'no')
+        try:
+            sbom_format = query.get('format', ['oss'])[-1]
+            if not sbom_format in FORMATS:
+                raise ValueError(f'unknown format: {sbom_format}')
+            errors = int(query.get('errors', ['10'])[-1])
+            if flag('check-vcs') and not args.allow_check_vcs:
+                raise PermissionError('check-vcs is not accepted without --allow-check-vcs')
+            source = root_file(args.root, query['file'][-1]) if 'file' in query else body
+            start = time.perf_counter()
+            result = checker.check(source, sbom_format, errors, check_mfr=flag('check-mfr'), find_purl=query.get('find-purl', []),
+                                   check_vcs=flag('check-vcs'), vcs_leaf_only=flag('check-vcs-leaf-only'), executor=executor)
+            answer = result.as_dict()
+        except PermissionError as e:
+            self._answer(403, {'error': str(e)})
+            return
+        except (OSError, ValueError) as e:
+            # unreadable files and invalid JSON, including duplicate keys
+            self._answer(400, {'error': str(e)})
+            return
+        except Exception as e:
+            # the client gets an answer whatever goes wrong with its request
+            logging.exception(f'{self.path}: {e!r}')
+            self._answer(500, {'error': f'internal error: {e!r}'})
+            return
+        logging.info(f'{self.path}: {len(result.errors)} ошибок, {time.perf_counter() - start:.3f} с')
+        self._answer(200, answer)
+
+    def _answer(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # the client address of a Unix socket is empty, the default log line would fail on it
+        logging.debug(format % args)
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if not args.socket and not is_loopback(args.host):
+        parser.error(f'{args.host} не является локальным адресом: сервер принимает запросы только на localhost')
+    if args.root:
+        args.root = os.path.realpath(args.root)
+        if not os.path.isdir(args.root):
+            parser.error(f'каталог {args.root} не найден')
+    from sbom_check import FORMATS, SbomChecker, worker_pool
+    logging.basicConfig(format='%(message)s', level=logging.INFO if args.verbose else logging.WARNING)
+
+    checker = SbomChecker()
+    executor = None
+    if args.jobs > 0:
+        executor = worker_pool(args.jobs)
+    else:
+        for sbom_format in FORMATS:
+            checker.validator(sbom_format)
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixHTTPServer(args.socket, CheckHandler)
+        print(f'сервер проверки sbom-файлов: {args.socket}', flush=True)
+    else:
+        server = http.server.ThreadingHTTPServer((args.host, args.port), CheckHandler)
+        server.daemon_threads = True
+        print(f'сервер проверки sbom-файлов: http://{args.host}:{server.server_address[1]}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket:
+            os.remove(args.socket)
+        if executor is not None:
+            executor.shutdown()
+        checker.close()
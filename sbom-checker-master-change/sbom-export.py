@@ -0,0 +1,25 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import logging
+
+from sbom_export import export_sbom
+
+parser = argparse.ArgumentParser(description='генератор таблиц компонентов в нескольких форматах за одно чтение входного файла')
+parser.add_argument('input', help='входной файл, содержащий перечень заимствованных компонентов, в JSON формате')
+parser.add_argument('--csv', metavar='FILE', help='выходной файл в формате csv (как у sbom-to-csv.py)')
+parser.add_argument('--odt', metavar='FILE', help='выходной файл в формате odt с таблицей заимствованных программных компонентов (как у sbom-to-odt.py --format=oss)')
+parser.add_argument('--odt-container', metavar='FILE', help='выходной файл в формате odt с таблицей образов контейнеров (как у sbom-to-odt.py --format=container)')
+parser.add_argument('--jsonl', metavar='FILE', help='выходной файл в формате JSON Lines: по одной записи (JSON pointer, название, версия, purl, свойства, ссылки) на каждый компонент, включая вложенные')
+parser.add_argument('-t', '--pa-fb-ontop', action='store_true', help='помещение записей "ПА" и "ФБ" в топ таблиц odt')
+parser.add_argument('-j', '--jobs', type=int, default=0, help='число одновременно записываемых выходных файлов; по умолчанию все')
+parser.add_argument('-v', '--verbose', action='store_true', help='подробный вывод')
+args = parser.parse_args()
+if args.verbose:
+    logging.basicConfig(format='%(message)s', level="INFO")
+
+if not (args.csv or args.odt or args.odt_container or args.jsonl):
+    parser.error('не указан ни один выходной файл (--csv, --odt, --odt-container, --jsonl)')
+
+export_sbom(args.input, args.csv, args.odt, args.odt_container, args.jsonl, args.pa_fb_ontop, args.jobs)
@@ -0,0 +1,30 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import logging
+
+from sbom_registry import iter_dump_files, iter_dump_records, RegistryIndex
+
+parser = argparse.ArgumentParser(description='импорт метаданных реестров пакетов в локальный индекс для sbom-updater.py --ref')
+parser.add_argument('paths', nargs='+', help='файлы или каталоги с выгрузками: *.nuspec, *.nupkg, JSON версий rubygems (api/v2/rubygems/<name>/versions/<version>.json), записи пакетов ecosyste.ms (*.json, *.jsonl)')
+parser.add_argument('--registry', metavar='FILE', help='файл индекса; по умолчанию registry.sqlite в каталоге данных пользователя sbom-checker')
+parser.add_argument('-v', '--verbose', action='store_true', help='подробный вывод')
+
+args = parser.parse_args()
+if args.verbose:
+    logging.basicConfig(format='%(message)s', level="INFO")
+
+def records(paths):
+    for path in iter_dump_files(paths):
+        try:
+            for record in iter_dump_records(path):
+                logging.info(f'{path}: {record[0]}')
+                yield record
+        except Exception as e:
+            print(f'WARNING: файл {path} пропущен: {e}')
+
+index = RegistryIndex(args.registry)
+count = index.add_many(records(args.paths))
+index.close()
+print(f'в индекс {index.filename} добавлено записей: {count}')
@@ -0,0 +1,381 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import namedtuple
+import concurrent.futures
+import contextlib
+import itertools
+import logging
+import os
+import threading
+
+from sbom_utils import check_repos, ComponentTree, DependencyChecker, load_cache, opener, parse_repo_urls, parse_sbom, \
+    SbomError, SbomIndex, SbomStream, stage
+from sbom_validation import before_components, component_digest, component_schema, format_non_unique, \
+    iter_component_errors, load_registry, load_schema, make_validator, sbom_error, ShardedValidator
+
+FORMATS = ('oss', 'container')
+SEPARATOR = '-' * 50
+COMPONENT_SEPARATOR = '-' * 60
+MFR_ADVICE = 'Рекомендуется эти компоненты НЕ включать в состав SBoM-файлов, обычно такие компоненты НЕ являются open source.'
+
+# a vcs url that is neither a repository nor a link into one, with the errors of the probes
+VcsFailure = namedtuple('VcsFailure', 'url error')
+
+def summary(component):
+    # fields printed for found components, kept instead of whole components
+    return {k: component[k] for k in ('bom-ref', 'name', 'version', 'type', 'manufacturer', 'purl') if k in component}
+
+def format_component(idx, component, matching_field):
+    return '\n'.join([
+        f"Component #{idx}:",
+        f"bom-ref: {component.get('bom-ref', 'NoData')}",
+        f"Name: {component.get('name', 'NoData')}",
+        f"Version: {component.get('version', 'NoData')}",
+        f"Type: {component.get('type', 'NoData')}",
+        f"Matching Field: {matching_field(component)}",
+    ]) + '\n' + COMPONENT_SEPARATOR
+
+def collect_vcs_urls(tree, leaf_only):
+    vcs_urls = []
+    for component in tree.walk(leaf_only=leaf_only):
+        refs = component.get('externalReferences', [])
+        if type(refs) == list:
+            for ref in refs:
+                if type(ref) == dict and ref.get('type', '') == 'vcs':
+                    vcs_urls.append(ref.get('url', ''))
+    return vcs_urls
+
+def read_sbom(source):
+    """The sbom of a file name or of bytes, duplicate keys are errors; an sbom already in memory is returned as is."""
+    if type(source) == dict:
+        return source
+    if isinstance(source, bytes):
+        return parse_sbom(source, pairs=True)
+    return opener(source, pairs=True)[0]
+
+class CheckResult(object):
+    """Findings of one check, printed by sbom-checker.py in this order."""
+    def __init__(self):
+        self.errors = [] # SbomErrors of the schema and the dependencies, up to the error limit
+        self.limit_reached = False
+        self.manufacturer = None # manufacturer of the product, with check_mfr
+        self.manufacturer_matches = [] # summaries of the components made by the manufacturer of the product
+        self.purl_matches = dict() # purl: summaries of the components found
+        self.not_repos = [] # VcsFailures
+
+    @property
+    def correct(self):
+        return not self.errors and not self.manufacturer_matches and not self.not_repos
+
+    def iter_output(self, errors=True):
+        """Blocks of text as sbom-checker.py prints them; errors=False skips the errors, printed while checking."""
+        if errors:
+            for error in self.errors:
+                yield error.message + '\n' + SEPARATOR
+        if self.manufacturer_matches:
+            yield f"Found {len(self.manufacturer_matches)} components matching metadata manufacturer '{self.manufacturer}':\n"
+            for idx, component in enumerate(self.manufacturer_matches, 1):
+                yield format_component(idx, component, lambda c: f"manufacturer.name = '{c.get('manufacturer', {}).get('name', 'Not specified')}'")
+            yield MFR_ADVICE
+        for purl, found in self.purl_matches.items():
+            yield f"Found {len(found)} components matching purl '{purl}':\n"
+            for idx, component in enumerate(found, 1):
+                yield format_component(idx, component, lambda c: f"purl = '{c.get('purl')}'")
+        for failure in self.not_repos:
+            yield f"WARNING: {failure.url} не подходит под шаблон и не является git/svn/hg/fossil-репозиторием\n" + SEPARATOR
+        if self.correct:
+            yield 'файл корректный'
+
+    def output(self):
+        """The whole output of sbom-checker.py."""
+        return ''.join(block + '\n' for block in self.iter_output())
+
+    def as_dict(self):
+        return {
+            'correct': self.correct,
+            'errors': [{'message': error.message, 'path': error.json_path} for error in self.errors],
+            'limit_reached': self.limit_reached,
+            'manufacturer': self.manufacturer,
+            'manufacturer_matches': self.manufacturer_matches,
+            'purl_matches': self.purl_matches,
+            'not_repos': [failure._asdict() for failure in self.not_repos],
+            'output': self.output(),
+        }
+
+class SbomChecker(object):
+    """Runs the checks of sbom-checker.py.
+
+    The schemas, their validators and the schema registry are built on first
+    use and kept, as is the cache of vcs checks, so a process checking many
+    sboms (sbom-check-server.py) builds them once. check() may be called from
+    several threads at once.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._registry = None
+        self._validators = dict()
+        self._repo_cache = None
+
+    def validator(self, sbom_format, component=False):
+        """(schema, validator) of a format; component=True gives the validator of one item of "components"."""
+        key = (sbom_format, component)
+        with self._lock:
+            if not key in self._validators:
+                if self._registry is None:
+                    self._registry = load_registry()
+                schema = load_schema(sbom_format)
+                self._validators[key] = (schema, make_validator(component_schema(schema) if component else schema, self._registry))
+            return self._validators[key]
+
+    def _piecewise_errors(self, components, envelope, sbom_format, jobs, limit, envelope_last=False, document=None):
+        """Validates items of "components" one by one (in `jobs` worker processes if requested),
+        reports repeated items and validates the rest of the document returned by envelope().
+
+        The errors come in the order of the validation of the whole document. With envelope_last
+        envelope() is only complete once the components are read (--stream), so the errors of the
+        components, up to the limit, are kept until it is validated. The errors about the top level
+        show `document`, the whole sbom, if it is given, otherwise the envelope.
+        """
+        component_errors = self._component_errors(components, sbom_format, jobs, limit)
+        if envelope_last:
+            with contextlib.closing(component_errors):
+                component_errors = list(itertools.islice(component_errors, limit or None))
+        def envelope_error(err):
+            if document is not None and not err.relative_path:
+                err.instance = document
+            return sbom_error(err)
+        schema, validator = self.validator(sbom_format)
+        envelope_errors = validator.iter_errors(envelope())
+        for err in envelope_errors:
+            if not before_components(schema, err):
+                yield from component_errors
+                yield envelope_error(err)
+                break
+            yield envelope_error(err)
+        else:
+            yield from component_errors
+        for err in envelope_errors:
+            yield envelope_error(err)
+
+    def _component_errors(self, components, sbom_format, jobs, limit):
+        """Errors of the items of "components", then the error about repeated items."""
+        digests = set()
+        dups = []
+        def checked(components):
+            for component in components:
+                digest = component_digest(component)
+                if digest in digests:
+                    dups.append(component)
+                digests.add(digest)
+                yield component
+        if jobs > 1:
+            yield from ShardedValidator(sbom_format, jobs, limit).iter_errors(checked(components))
+        else:
+            _, component_validator = self.validator(sbom_format, component=True)
+            for idx, component in enumerate(checked(components)):
+                for err in iter_component_errors(component_validator, component, idx):
+                    yield sbom_error(err)
+        if dups:
+            unique_dups = []
+            for component in dups:
+                if not component in unique_dups:
+                    unique_dups.append(component)
+            yield SbomError(format_non_unique("On instance['components']", unique_dups), ('components',))
+
+    def check(self, source, sbom_format='oss', errors=10, check_mfr=False, find_purl=(), check_vcs=False,
+              vcs_leaf_only=False, stream=False, jobs=1, executor=None, on_error=None):
+        """Checks an sbom (a file name, the bytes of a file or the parsed sbom) and returns a CheckResult.
+
+        The options are those of sbom-checker.py; errors=0 reports all errors.
+        on_error(error) is called for every SbomError as soon as it is found.
+        With an executor of worker_pool() the whole document is validated in
+        one of its worker processes, stream and jobs are ignored then. A parsed
+        sbom is not streamed either.
+        """
+        result = CheckResult()
+        def report(error):
+            """Keeps an error, returns True once the error limit is reached."""
+            result.errors.append(error)
+            if on_error:
+                on_error(error)
+            result.limit_reached = bool(errors and len(result.errors) >= errors)
+            return result.limit_reached
+
+        check_vcs = check_vcs or vcs_leaf_only
+        stream = stream and executor is None and type(source) != dict
+        find_purl = list(find_purl or [])
+        dependency_checker = DependencyChecker()
+        if executor is not None:
+            # the worker parses the document too, while it is parsed here for the other checks
+            future = executor.submit(_worker_errors, sbom_format, source, errors)
+            try:
+                document = read_sbom(source)
+            except BaseException:
+                future.cancel()
+                raise
+            messages = _future_messages(future)
+        elif stream:
+            sbom_stream = SbomStream(source, pairs=True)
+            mfr_candidates = dict()
+            purl_matches = {purl: [] for purl in find_purl}
+            vcs_urls = []
+            def collected(stream):
+                for idx, component in enumerate(stream):
+                    item_tree = ComponentTree([component])
+                    dependency_checker.add_tree(item_tree, offset=idx)
+                    if check_mfr or purl_matches:
+                        index = SbomIndex({}, item_tree)
+                        # (depth, top-level item, index in the item) orders the matches as the breadth-first
+                        # walk of the whole document does
+                        located = lambda indices: [((item_tree.depths[i], idx, i), summary(item_tree.components[i]))
+                                                   for i in indices]
+                        for name, indices in index.by_manufacturer.items():
+                            mfr_candidates.setdefault(name, []).extend(located(indices))
+                        for purl in purl_matches:
+                            purl_matches[purl] += located(index.find_purl(purl))
+                    if check_vcs:
+                        vcs_urls.extend(collect_vcs_urls(item_tree, vcs_leaf_only))
+                    yield component
+            components = collected(sbom_stream)
+            def envelope():
+                # the top-level keys after "components" are read with the rest of the file
+                for _ in components:
+                    pass
+                return sbom_stream.envelope
+            messages = self._piecewise_errors(components, envelope, sbom_format, jobs, errors, envelope_last=True)
+        else:
+            document = read_sbom(source)
+            if jobs > 1 and type(document) == dict and type(document.get('components')) == list:
+                messages = self._piecewise_errors(document['components'], lambda: dict(document, components=[]),
+                                                  sbom_format, jobs, errors, document=document)
+            else:
+                messages = (sbom_error(err) for err in self.validator(sbom_format)[1].iter_errors(document))
+        with stage('validate'):
+            for error in messages:
+                if report(error):
+                    break
+            # stops the workers of jobs
+            messages.close()
+        if stream:
+            # envelope() has read the whole file
+            document = sbom_stream.envelope
+            if type(document) == dict:
+                dependency_checker.add_document(document)
+            in_tree_order = lambda matches: [match for _, match in sorted(matches, key=lambda m: m[0])]
+            find_manufacturer = lambda name: in_tree_order(mfr_candidates.get(name, []))
+            find = lambda purl: in_tree_order(purl_matches[purl])
+        elif type(document) == dict:
+            tree = ComponentTree(document.get('components', []))
+            dependency_checker.add_document(document, tree)
+            index = SbomIndex(document, tree) if check_mfr or find_purl else None
+            find_manufacturer = lambda name: [summary(c) for c in index.components(index.find_manufacturer(name))]
+            find = lambda purl: [summary(c) for c in index.components(index.find_purl(purl))]
+            if check_vcs:
+                vcs_urls = collect_vcs_urls(tree, vcs_leaf_only)
+
+        if type(document) != dict:
+            # not an sbom at all, the schema errors are all there is to report
+            return result
+
+        if not result.limit_reached:
+            with stage('dependencies'):
+                for error in dependency_checker.iter_errors(document.get('dependencies', [])):
+                    if report(error._replace(message='ERROR: ' + error.message)):
+                        break
+
+        if check_mfr:
+            metadata = document.get('metadata', {})
+            metadata_component = metadata.get('component', {}) if type(metadata) == dict else {}
+            result.manufacturer = metadata_component.get('manufacturer', {}).get('name')
+            if result.manufacturer != None:
+                # Looking for matches in all components, including nested ones
+                result.manufacturer_matches = find_manufacturer(result.manufacturer)
+
+        for purl in find_purl:
+            result.purl_matches[purl] = find(purl)
+
+        if check_vcs:
+            os.environ['GIT_TERMINAL_PROMPT'] = '0'
+            result.not_repos = self._not_repos(vcs_urls)
+        return result
+
+    def _not_repos(self, vcs_urls):
+        with self._lock:
+            if self._repo_cache is None:
+                self._repo_cache = load_cache()
+        repo_cache = self._repo_cache
+        refs_to_check = dict()
+        for ref_url, res in parse_repo_urls(vcs_urls).items():
+            url = res[0] if res and res[1] else ref_url
+            if not url in refs_to_check:
+                refs_to_check[url] = set()
+            refs_to_check[url].add(ref_url)
+        repo_dict = dict()
+        for url in refs_to_check:
+            entry = repo_cache.get(url)
+            if entry is not None:
+                repo_dict[url] = entry
+        for url, entry in check_repos([url for url in refs_to_check if not url in repo_dict]).items():
+            repo_cache.set(url, *entry)
+            repo_dict[url] = entry
+        not_repos = []
+        for url, (is_repo, ex_str) in repo_dict.items():
+            if not is_repo:
+                for u in sorted(list(refs_to_check[url])):
+                    logging.info(ex_str)
+                    not_repos.append(VcsFailure(u, ex_str))
+        return not_repos
+
+    def close(self):
+        with self._lock:
+            if self._repo_cache is not None:
+                self._repo_cache.close()
+                self._repo_cache = None
+
+# checker shared by the callers of check_sbom in the process
+_shared_checker = None
+_shared_lock = threading.Lock()
+
+def check_sbom(source, sbom_format='oss', errors=0, **options):
+    """Checks an sbom (a file name, the bytes of a file or the parsed sbom) and returns a CheckResult.
+
+    The validators and the cache of vcs checks are built on the first call and
+    kept by the process; the options are those of SbomChecker.check, all errors
+    are reported by default.
+    """
+    global _shared_checker
+    with _shared_lock:
+        if _shared_checker is None:
+            _shared_checker = SbomChecker()
+    return _shared_checker.check(source, sbom_format, errors, **options)
+
+def _future_messages(future):
+    try:
+        yield from future.result()
+    finally:
+        future.cancel()
+
+# checker of a worker process of worker_pool(), with the validators of all formats built by _init_worker
+_worker_checker = None
+
+def _init_worker():
+    global _worker_checker
+    _worker_checker = SbomChecker()
+    for sbom_format in FORMATS:
+        _worker_checker.validator(sbom_format)
+
+def _worker_errors(sbom_format, source, limit):
+    errors = []
+    for err in _worker_checker.validator(sbom_format)[1].iter_errors(read_sbom(source)):
+        errors.append(sbom_error(err))
+        if limit and len(errors) >= limit:
+            break
+    return errors
+
+def worker_pool(jobs):
+    """Worker processes validating whole documents for SbomChecker.check(executor=...)."""
+    executor = concurrent.futures.ProcessPoolExecutor(jobs, initializer=_init_worker)
+    # starts all workers now, so their validators are ready before the first check
+    concurrent.futures.wait([executor.submit(os.getpid) for _ in range(jobs)])
+    return executor
@@ -0,0 +1,221 @@
+# SPDX-FileCopyrightText: 2024 Artem Irkhin
+# SPDX-License-Identifier: Apache-2.0
+
+import concurrent.futures
+import csv
+import io
+import json
+import logging
+from pathlib import Path
+import re
+from xml.sax.saxutils import escape
+import zipfile
+
+from sbom_utils import ComponentTree, sbom_source, stage, WRITE_BUFFER_SIZE
+
+CSV_HEADER = ['№ п/п','Наименование компонента', 'Версия компонента', 'Язык (языки) программирования, на котором написан компонент', 'Принадлежность компонента к поверхности атаки программного обеспечения и (или) к компонентам, реализующим функции безопасности', 'Адрес веб-ресурса, на котором расположен исходный код компонента']
+SPECIAL_VALUES = ('yes', 'indirect', 'no')
+ODT_TEMPLATES = Path(__file__).parent.resolve() / 'odt_templates'
+# generated rows are appended to the table of the template, after its header row
+ODT_TABLE_END = '</table:table>'
+ATTACK_SURFACE_TEXT = {'yes': 'поверхность атаки', 'indirect': 'косвенная поверхность атаки'}
+SECURITY_FUNCTION_TEXT = {'yes': 'функция безопасности', 'indirect': 'поддерживающая функции безопасности'}
+# characters XML 1.0 can't hold (or discourages), replaced as odfpy did
+_XML_FILTERED = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x84\x86-\x9f\ud800-\udfff\ufdd0-\ufddf\ufffe\uffff]')
+
+def reference_urls(component):
+    ext_refs = component.get('externalReferences')
+    urls = ''
+    if ext_refs:
+        for item in ext_refs:
+            if item['type'] == 'vcs':
+                urls+=f'Репозиторий: {item["url"]}\n'
+            elif item['type'] == 'website':
+                urls+=f'Адрес веб-ресурса компонента: {item["url"]}\n'
+            else:
+                urls+=f'Иное: {item["url"]}\n'
+    return urls
+
+def csv_rows(tree):
+    """Yields the table rows of the components of a ComponentTree, repeated rows are skipped."""
+    added_elements = set()
+    idx = 1
+    for i, component in enumerate(tree.walk()):
+        urls = reference_urls(component)
+        props = tree.props(i)
+        attack_surface = props.get('GOST:attack_surface', '')
+        if not attack_surface in SPECIAL_VALUES:
+            attack_surface = 'yes/indirect/no'
+        security_function = props.get('GOST:security_function', '')
+        if not security_function in SPECIAL_VALUES:
+            security_function = 'yes/indirect/no'
+        langs = props.get('source_langs', '')
+        # the dict itself can't be a part of the key
+        element = (component['name'], component['version'], langs, attack_surface, security_function, urls)
+        if element in added_elements:
+            continue
+        added_elements.add(element)
+        special_function = {"GOST:attack_surface": attack_surface, "GOST:security_function": security_function}
+        yield [idx, component['name'], component['version'], langs, special_function, urls]
+        idx += 1
+
+def write_csv(tree, filename):
+    with stage('write_csv'), open(filename, 'w', newline="", buffering=WRITE_BUFFER_SIZE) as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(csv_rows(tree))
+
+def jsonl_records(tree):
+    """Yields one record per component in breadth-first order, repeated components included."""
+    for i, component in enumerate(tree.walk()):
+        props = tree.props(i)
+        refs = component.get('externalReferences', [])
+        yield {
+            'pointer': tree.pointer(i),
+            'name': component.get('name', ''),
+            'version': component.get('version', ''),
+            'purl': component.get('purl', ''),
+            'source_langs': props.get('source_langs', ''),
+            'GOST:attack_surface': props.get('GOST:attack_surface', ''),
+            'GOST:security_function': props.get('GOST:security_function', ''),
+            'externalReferences': [{'type': ref.get('type', ''), 'url': ref.get('url', '')}
+                                   for ref in refs if type(ref) == dict] if type(refs) == list else [],
+        }
+
+def write_jsonl(tree, filename):
+    with stage('write_jsonl'), open(filename, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as file:
+        for record in jsonl_records(tree):
+            file.write(json.dumps(record, ensure_ascii=False))
+            file.write('\n')
+
+def get_ext_ref(er_list):
+    for er in er_list:
+        if er['type'] in ['vcs', 'source-distribution']:
+            return er['url']
+    return ''
+
+def special_function_text(attack_surface, security_function):
+    _as_text = ATTACK_SURFACE_TEXT.get(attack_surface, '')
+    _sf_text = SECURITY_FUNCTION_TEXT.get(security_function, '')
+    return ', '.join([_as_text, _sf_text]) if _as_text and _sf_text else (_as_text+_sf_text)
+
+def pa_fb_key(attack_surface, security_function):
+    """Sort key of --pa-fb-ontop: components of the attack surface ("ПА") first, then security functions ("ФБ")."""
+    return (attack_surface in {'yes', 'indirect'}, security_function in {'yes', 'indirect'})
+
+def odt_row(row_style, cell_style, text_style, cells):
+    """XML of a table row, the same markup odfpy produced for TableRow/TableCell/P."""
+    parts = [f'<table:table-row table:style-name="{row_style}">']
+    for text in cells:
+        parts.append(f'<table:table-cell table:style-name="{cell_style}"><text:p text:style-name="{text_style}">'
+                     f'{escape(_XML_FILTERED.sub(chr(0xfffd), text))}</text:p></table:table-cell>')
+    parts.append('</table:table-row>')
+    return ''.join(parts)
+
+def odt_oss_rows(tree, pa_fb_ontop=False):
+    """Yields the table rows of all components, repeated rows are skipped."""
+    added_elements = set()
+    elements = []
+    for i in tree.indices():
+        comp = tree.components[i]
+        props = tree.props(i)
+        element = (comp.get('name', ''),
+                   comp.get('version', ''),
+                   props.get('source_langs', ''),
+                   props.get('GOST:attack_surface', ''),
+                   props.get('GOST:security_function', ''),
+                   get_ext_ref(comp.get('externalReferences', [])))
+        if element in added_elements:
+            continue
+        added_elements.add(element)
+        elements.append(element)
+    if pa_fb_ontop:
+        # the sort is stable, so repeated rows dropped above are the same ones as when sorting first
+        elements.sort(key=lambda e: pa_fb_key(e[3], e[4]), reverse=True)
+    for idx, element in enumerate(elements, 1):
+        yield odt_row('Table3.1', 'Table3.A1', 'P3',
+                      (str(idx),) + element[:3] + (special_function_text(element[3], element[4]), element[5]))
+
+def odt_container_rows(tree, pa_fb_ontop=False):
+    """Yields the table rows of the top-level components (images) with the software they contain."""
+    indices = range(tree.top_count)
+    if pa_fb_ontop:
+        keys = [pa_fb_key(tree.get_prop(i, 'GOST:attack_surface'), tree.get_prop(i, 'GOST:security_function'))
+                for i in indices]
+        indices = sorted(indices, key=keys.__getitem__, reverse=True)
+    for idx, i in enumerate(indices, 1):
+        comp = tree.components[i]
+        deps = dict()
+        for j in tree.descendants(i):
+            dep = tree.components[j]
+            deps[dep.get('name', '') + ' ' + dep.get('version', '')] = None
+        yield odt_row('Table2', 'Table2.A1', 'P4',
+                      (str(idx), comp.get('name', ''), comp.get('description', ''), '\n'.join(deps),
+                       special_function_text(tree.get_prop(i, 'GOST:attack_surface'), tree.get_prop(i, 'GOST:security_function'))))
+
+def _add_text_properties(content, style_name, properties):
+    """Appends <style:text-properties> to an automatic style of content.xml."""
+    start = content.index(f'<style:style style:name="{style_name}"')
+    end = content.index('</style:style>', start)
+    return content[:end] + f'<style:text-properties {properties}/>' + content[end:]
+
+def write_odt(tree, filename, sbom_format='oss', pa_fb_ontop=False):
+    """Writes the component table into a copy of the odt template.
+
+    Members of the template other than content.xml are copied as is; the rows
+    are streamed into content.xml, so the document is never held in memory.
+    """
+    if sbom_format == 'oss':
+        template = ODT_TEMPLATES / 'template.odt'
+        rows = odt_oss_rows(tree, pa_fb_ontop)
+    else:
+        template = ODT_TEMPLATES / 'template_container.odt'
+        rows = odt_container_rows(tree, pa_fb_ontop)
+    with stage('write_odt'), zipfile.ZipFile(template) as src, zipfile.ZipFile(filename, 'w') as dst:
+        # mimetype stays the first and uncompressed member, as the format requires
+        for info in src.infolist():
+            if info.filename != 'content.xml':
+                dst.writestr(info, src.read(info))
+                continue
+            content = src.read(info).decode('utf-8')
+            if sbom_format != 'oss':
+                content = _add_text_properties(content, 'P4', 'fo:font-size="10pt"')
+            pos = content.index(ODT_TABLE_END)
+            with io.TextIOWrapper(io.BufferedWriter(dst.open(info, 'w'), WRITE_BUFFER_SIZE), encoding='utf-8') as f:
+                f.write(content[:pos])
+                for row in rows:
+                    f.write(row)
+                f.write(content[pos:])
+
+def export_sbom(source, csv_file=None, odt_file=None, odt_container_file=None, jsonl_file=None, pa_fb_ontop=False, jobs=0):
+    """Writes the tables of sbom-export.py for an sbom (a file name or the parsed sbom) read once.
+
+    The files are written simultaneously, by `jobs` threads or one thread per
+    file; returns their names in the order they are finished.
+    """
+    sinks = []
+    if csv_file:
+        sinks.append((csv_file, write_csv, ()))
+    if odt_file:
+        sinks.append((odt_file, write_odt, ('oss', pa_fb_ontop)))
+    if odt_container_file:
+        sinks.append((odt_container_file, write_odt, ('container', pa_fb_ontop)))
+    if jsonl_file:
+        sinks.append((jsonl_file, write_jsonl, ()))
+    if not sinks:
+        raise ValueError('No output file')
+
+    input_data = sbom_source(source)[0]
+    # the tree and the property cache are built once and shared by all outputs, which only read them;
+    # ComponentTree.props fills the cache lazily, so it is filled here before the threads start
+    tree = ComponentTree(input_data.get('components', []))
+    for i in tree.indices():
+        tree.props(i)
+    written = []
+    with concurrent.futures.ThreadPoolExecutor(jobs or len(sinks)) as executor:
+        futures = {executor.submit(write, tree, filename, *options): filename for filename, write, options in sinks}
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+            logging.info(f'{futures[future]} записан')
+            written.append(futures[future])
+    return written
@@ -0,0 +1,164 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import platformdirs
+import sqlite3
+import xml.etree.ElementTree as ET
+import zipfile
+
+from sbom_utils import purl_without_version, SP_TIMEOUT, stage
+
+REGISTRY_FILE = 'registry.sqlite'
+# sources in the order sbom-updater consults them
+SOURCES = ('ecosyste.ms', 'nuget', 'rubygems')
+GEM_URL_KEYS = ('source_code_uri', 'project_uri', 'homepage_uri')
+
+def default_registry_path():
+    return platformdirs.user_data_path('sbom-checker') / REGISTRY_FILE
+
+def purl_key(purl):
+    """Purls are looked up case-insensitively, without qualifiers and subpath."""
+    return purl.split('#', 1)[0].split('?', 1)[0].lower()
+
+def ecosystems_urls(record):
+    """Urls of an ecosyste.ms package record, in the order they are tried."""
+    return [record.get("repository_url", ''), record.get("registry_url", ''), record.get("homepage", '')]
+
+def nuspec_urls(root):
+    """(id, version, urls, repository url) of a parsed .nuspec document."""
+    id = version = repository = ''
+    urls = []
+    for child in root:
+        if child.tag.endswith("metadata"):
+            for child2 in child:
+                local_name = child2.tag.rsplit('}', 1)[-1]
+                if local_name == "id":
+                    id = child2.text or ''
+                elif local_name == "version":
+                    version = child2.text or ''
+                elif child2.tag.endswith("projectUrl"):
+                    if not child2.text in urls:
+                        urls.append(child2.text)
+                elif child2.tag.endswith("repository"):
+                    if child2.attrib.get("url", ''):
+                        repository = child2.attrib['url']
+                        if not repository in urls:
+                            urls.append(repository)
+    return id, version, list(reversed(urls)), repository
+
+def gem_urls(gem_data):
+    """Urls of a rubygems version record (api/v2/rubygems/<name>/versions/<version>.json)."""
+    urls = []
+    md = gem_data.get('metadata', dict())
+    for kw in GEM_URL_KEYS:
+        url = gem_data.get(kw, '')
+        if url and not url in urls:
+            urls.append(url)
+        url = md.get(kw, '')
+        if url and not url in urls:
+            urls.append(url)
+    return urls
+
+class RegistryIndex(object):
+    """Registry metadata imported from local dumps, stored in sqlite.
+
+    Every record keeps the urls of a package (or of one version of it) found
+    in a source and the repository url the source declares. Lookups by purl
+    first try the exact version and then the package itself.
+    """
+    def __init__(self, filename=None):
+        self.filename = filename or default_registry_path()
+        self._conn = None
+
+    def exists(self):
+        return os.path.isfile(self.filename)
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+            conn = sqlite3.connect(self.filename, timeout=SP_TIMEOUT, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS packages '
+                         '(purl TEXT, source TEXT, urls TEXT, repository TEXT, PRIMARY KEY (purl, source))')
+            self._conn = conn
+        return self._conn
+
+    def add_many(self, records):
+        """Stores (purl, source, urls, repository) records in one transaction, returns their number."""
+        conn = self._connect()
+        count = 0
+        with stage('import'):
+            conn.execute('BEGIN')
+            try:
+                for purl, source, urls, repository in records:
+                    conn.execute('INSERT OR REPLACE INTO packages (purl, source, urls, repository) VALUES (?, ?, ?, ?)',
+                                 (purl_key(purl), source, json.dumps(urls), repository or ''))
+                    count += 1
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        return count
+
+    def lookup(self, purl):
+        """Returns [(source, urls, repository)] in the order of SOURCES."""
+        key = purl_key(purl)
+        found = dict()
+        for k in (key, purl_without_version(key)):
+            for source, urls, repository in self._connect().execute(
+                    'SELECT source, urls, repository FROM packages WHERE purl = ?', (k,)):
+                found.setdefault(source, (source, json.loads(urls), repository))
+        return [found[source] for source in SOURCES if source in found]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+def _json_records(data):
+    for record in data if type(data) == list else [data]:
+        if type(record) != dict:
+            continue
+        if 'purl' in record and ('repository_url' in record or 'registry_url' in record or 'homepage' in record):
+            yield record['purl'], 'ecosyste.ms', ecosystems_urls(record), record.get('repository_url', '')
+        elif 'name' in record and 'version' in record and any(kw in record for kw in GEM_URL_KEYS):
+            yield f"pkg:gem/{record['name']}@{record['version']}", 'rubygems', gem_urls(record), \
+                record.get('source_code_uri', '') or record.get('metadata', dict()).get('source_code_uri', '')
+
+def _nuspec_record(root):
+    id, version, urls, repository = nuspec_urls(root)
+    if id and version:
+        yield f'pkg:nuget/{id}@{version}', 'nuget', urls, repository
+
+def iter_dump_records(path):
+    """Records of a dump file: .nuspec/.nupkg, rubygems version JSON and
+    ecosyste.ms package records (JSON array, object or JSON lines).
+    """
+    name = str(path).lower()
+    if name.endswith('.nuspec'):
+        yield from _nuspec_record(ET.parse(path).getroot())
+    elif name.endswith('.nupkg'):
+        with zipfile.ZipFile(path) as z:
+            for member in z.namelist():
+                if member.lower().endswith('.nuspec') and not '/' in member:
+                    yield from _nuspec_record(ET.fromstring(z.read(member)))
+    elif name.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield from _json_records(json.loads(line))
+    elif name.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            yield from _json_records(json.load(f))
+
+def iter_dump_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    yield os.path.join(dirpath, filename)
+        else:
+            yield path
@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import deque, namedtuple
+import concurrent.futures
+import datetime
+import functools
+import itertools
+import json
+from pathlib import Path
+
+from sbom_utils import product_component, product_tree, SbomMerger
+
+# the unified sbom and the encoding of the last input, in which it is written
+UnifyResult = namedtuple('UnifyResult', 'document encoding')
+
+@functools.lru_cache(maxsize=None)
+def product_keys():
+    """Top-level keys of an sbom that are component keys too, they are moved into the product components."""
+    with open(Path(__file__).parent.resolve() / 'schemas' / 'schema.json') as f:
+        schema = json.load(f)
+    keys = set(schema['properties']).intersection(schema['$defs']['component']['properties'])
+    if 'version' in keys:
+        keys.remove('version')
+    if 'name' in keys:
+        keys.remove('name')
+    if 'type' in keys:
+        keys.remove('type')
+    return frozenset(keys)
+
+def run_now(fn, *fn_args):
+    # no executor: inputs are processed in this process
+    future = concurrent.futures.Future()
+    future.set_result(fn(*fn_args))
+    return future
+
+def ordered_results(submit, calls, window):
+    """Yields the results of calls in order, with at most `window` of them submitted ahead."""
+    pending = deque()
+    for call in calls:
+        pending.append(submit(*call))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def unified_sbom(sources, app_name, app_version, manufacturer, deep_merge=False, executor=None, window=2):
+    """The sbom of sbom-unifier.py as (data, encoding); "components" and "dependencies" of the data are
+    generators to be consumed in this order, so write_sbom writes the components as they are read.
+
+    sources are file names or parsed sboms; with an executor they are read in
+    its workers, at most `window` ahead.
+    """
+    submit = executor.submit if executor else run_now
+    # the output is written in the encoding of the last input, so it is read first;
+    # the rest are read ahead by the workers and written out as they arrive
+    worker = product_tree if deep_merge else product_component
+    keys = product_keys()
+    calls = [(worker, source, keys) for source in sources[-1:] + sources[:-1]]
+    results = ordered_results(submit, calls, window)
+    last_result = next(results)
+    encoding = last_result[-1]
+    merger = SbomMerger() if deep_merge else None
+
+    def all_components():
+        for result in itertools.chain(results, [last_result]):
+            if merger:
+                yield merger.add(result[0], result[1])
+            else:
+                yield result[0]
+
+    output_data = {
+      "bomFormat": "CycloneDX",
+      "specVersion": "1.6",
+      "version": 1,
+      "metadata": {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "component": {
+            "type": "application",
+            "name": app_name,
+            "version": app_version,
+            "manufacturer": {
+                "name": manufacturer
+            }
+        }
+      },
+      "components": all_components()
+    }
+    if merger:
+        # written after "components", when every input is merged
+        output_data['dependencies'] = merger.iter_dependencies()
+    return output_data, encoding
+
+def unify_sboms(sources, app_name, app_version, manufacturer, deep_merge=False, executor=None, window=2):
+    """Same as unified_sbom with the components and dependencies in lists, returns an UnifyResult."""
+    data, encoding = unified_sbom(list(sources), app_name, app_version, manufacturer, deep_merge, executor, window)
+    data['components'] = list(data['components'])
+    if 'dependencies' in data:
+        data['dependencies'] = list(data['dependencies'])
+    return UnifyResult(data, encoding)
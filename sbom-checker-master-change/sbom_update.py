@@ -0,0 +1,389 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import datetime
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import urllib.parse
+import xml.etree.ElementTree as ET
+
+from sbom_registry import ecosystems_urls, gem_urls, nuspec_urls, RegistryIndex
+from sbom_utils import check_repo, ComponentTree, load_cache, load_purl_cache, MAX_HOST_PROBES, probe, SbomDiff, sbom_source, stage
+
+DEFAULT_VALUE = "TODO"
+# registry addresses, can be pointed to local mirrors or stand-ins
+ECOSYSTEMS_API = os.environ.get('SBOM_ECOSYSTEMS_API', 'https://packages.ecosyste.ms/api/v1')
+NUGET_INDEX = os.environ.get('SBOM_NUGET_INDEX', 'https://api.nuget.org/v3/index.json')
+RUBYGEMS_API = os.environ.get('SBOM_RUBYGEMS_API', 'https://rubygems.org/api/v2')
+RESOLVE_JOBS = 8 # purls resolved simultaneously by default
+
+def get_website(ref_arr):
+    for elem in ref_arr:
+        if elem['type'] == 'website':
+            return elem
+    return False
+
+class RefFinder(object):
+    def __init__(self, purl_file=None, jobs=1, registry=None, offline=False):
+        self._placeholder_url = 'sbom-updater_generated_placeholder:'
+        self._nuget_addr = None
+        self._jobs = jobs
+        # local index of registry metadata, consulted before the registries themselves
+        self._registry = registry
+        self._offline = offline
+        self._lock = threading.Lock()
+        self._nuget_lock = threading.Lock()
+        self._host_sems = dict()
+        self._url_locks = dict()
+        self._log = threading.local()
+        # requests is only needed for --ref
+        from requests import Session, adapters
+        self._session = Session()
+        adapter = adapters.HTTPAdapter(max_retries=5, pool_maxsize=max(jobs, 10))
+        self._session.mount('http://', adapter=adapter)
+        self._session.mount('https://', adapter=adapter)
+        self._prefixes = {
+            'pkg:nuget/': self._nuget_purl,
+            'pkg:gem/': self._gem_purl,
+        }
+        self._purl_to_url = dict()
+        try:
+            with open(purl_file) as f:
+                self._purl_to_url = json.load(f)
+        except Exception:
+            pass
+        self._repo_cache = load_cache()
+        # purls resolved by previous runs
+        self._purl_cache = load_purl_cache()
+        os.environ['GIT_TERMINAL_PROMPT'] = '0'
+
+    def _info(self, message):
+        # messages of a purl resolved in a worker thread are printed together
+        buf = getattr(self._log, 'buf', None)
+        if buf is None:
+            logging.info(message)
+        else:
+            buf.append(message)
+
+    def _host_limit(self, url):
+        host = urllib.parse.urlparse(url).hostname or ''
+        with self._lock:
+            if not host in self._host_sems:
+                self._host_sems[host] = threading.BoundedSemaphore(MAX_HOST_PROBES)
+            return self._host_sems[host]
+
+    def _get(self, url):
+        with self._host_limit(url), probe('http'):
+            res = self._session.get(url)
+            # the body is read while the host slot is held
+            res.content
+        return res
+
+    def is_repo(self, url, declared=False):
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        # the same url found for several purls is checked once
+        with url_lock:
+            entry = self._repo_cache.get(url)
+            if entry is None:
+                if self._offline:
+                    # urls can't be checked offline, the repository declared by the registry is trusted
+                    return declared
+                with self._host_limit(url):
+                    entry = check_repo(url)
+                self._repo_cache.set(url, *entry)
+                if not entry[0]:
+                    self._info(entry[1])
+        return entry[0]
+
+    def resolve(self, purls, urls=()):
+        """Resolves unique purls and checks urls for repositories in --jobs threads beforehand,
+        so that process_purl and is_repo answer from memory afterwards.
+        """
+        purls = [purl for purl in dict.fromkeys(purls) if not purl in self._purl_to_url]
+        urls = list(dict.fromkeys(urls))
+        if self._jobs <= 1:
+            return
+        with ThreadPoolExecutor(self._jobs) as executor:
+            futures = [executor.submit(self.process_purl, purl) for purl in purls]
+            futures += [executor.submit(self.is_repo, url) for url in urls]
+            for future in futures:
+                future.result()
+
+    def close(self):
+        self._repo_cache.close()
+        self._purl_cache.close()
+        if self._registry:
+            self._registry.close()
+
+    def process_purl(self, purl):
+        if purl in self._purl_to_url:
+            return self._purl_to_url[purl]
+        entry = self._purl_cache.get(purl)
+        if entry is not None:
+            self._purl_to_url[purl] = entry[0]
+            return entry[0]
+        self._log.buf = []
+        try:
+            self._info(f'обработка purl {purl}')
+
+            url = None
+            for source, urls, repository in self._registry.lookup(purl) if self._registry else []:
+                url = self._analyse_urls(urls, purl, f'{source} (локальный индекс): ', repository)
+                if url:
+                    break
+            if not url and self._offline:
+                self._info(f'не удалось найти репозиторий для purl {purl} в локальном индексе')
+            elif not url:
+                urls = self._ecosystems(purl)
+                url = self._analyse_urls(urls, purl, 'ecosyste.ms: ')
+                if not url:
+                    for k, f in self._prefixes.items():
+                        if purl.startswith(k):
+                            urls = f(purl)
+                            url = self._analyse_urls(urls, purl, '')
+                            break
+                    else:
+                        self._info(f'не удалось найти репозиторий для purl {purl}')
+            self._info('-'*50)
+            self._purl_to_url[purl] = url if url else self._placeholder_url
+            # purls not found offline are looked up online next time
+            if url or not self._offline:
+                self._purl_cache.set(purl, self._purl_to_url[purl], ok=bool(url))
+        finally:
+            buf, self._log.buf = self._log.buf, None
+            for message in buf:
+                logging.info(message)
+        return self._purl_to_url[purl]
+
+    def _analyse_urls(self, urls, purl, log_prefix, repository=''):
+        if repository.startswith('git://'):
+            repository = "https" + repository[3:]
+        for url in urls:
+            if type(url) == str:
+                if url.startswith('git://'):
+                    url = "https" + url[3:]
+                if self.is_repo(url, declared=url == repository):
+                    self._info(f'{log_prefix}найден репозиторий {url} среди {urls}')
+                    return url
+        self._info(f'{log_prefix}ни одна из {urls} не является git-репозиторием')
+        return None
+
+    def _ecosystems(self, purl):
+        ecosystems_data = None
+        with self._get(f"{ECOSYSTEMS_API}/packages/lookup?purl={purl.lower()}") as res:
+            ecosystems_data = res.json()
+        if ecosystems_data:
+            return ecosystems_urls(ecosystems_data[0])
+        return []
+
+    def _nuget_purl(self, purl):
+        id, version = purl.split("@")
+        id = id[10:]
+        with self._nuget_lock:
+            if not self._nuget_addr:
+                with self._get(NUGET_INDEX) as res:
+                    for resource in res.json().get("resources", []):
+                        if resource["@type"].startswith("PackageBaseAddress"):
+                            self._nuget_addr = resource["@id"]
+        package_address = f"{self._nuget_addr}{id.lower()}/{version.lower()}/{id.lower()}.nuspec"
+        root = []
+        with self._get(package_address) as res:
+            root = ET.fromstring(res.text)
+        return nuspec_urls(root)[2]
+
+    def _gem_purl(self, purl):
+        id, version = purl.split("@")
+        id = id[8:]
+        gem_data = dict()
+        with self._get(f'{RUBYGEMS_API}/rubygems/{id.lower()}/versions/{version.lower()}.json') as res:
+            gem_data = res.json()
+        return gem_urls(gem_data)
+
+PURL_FILE = Path(__file__).parent.resolve() / 'purl_to_vcs.json'
+
+# the updated sbom, the encoding of its input file and the JSON patch turning the previous version
+# into the input (SbomDiff.patch(), None unless asked for)
+UpdateResult = namedtuple('UpdateResult', 'document encoding diff')
+
+def _metadata_component(input_data):
+    if not 'metadata' in input_data:
+        input_data['metadata'] = dict()
+    if not 'component' in input_data['metadata']:
+        input_data['metadata']['component'] = dict()
+    return input_data['metadata']['component']
+
+def update_sbom(source, props=False, app_name=None, app_version=None, manufacturer=None, ref=False, fix_all=False,
+                old=None, diff=False, registry=None, offline=False, jobs=RESOLVE_JOBS):
+    """Updates an sbom as sbom-updater.py does and returns an UpdateResult.
+
+    source and old (the previous version, --update) are file names or parsed
+    sboms; a parsed source is changed in place. registry is the file of the
+    local registry index, the default index is used if it exists.
+    """
+    input_data, encoding = sbom_source(source)
+
+    if fix_all:
+        if input_data['specVersion'] != '1.6':
+            logging.info(f"смена 'specVersion' с {input_data['specVersion']} на 1.6")
+            logging.info('-'*50)
+            input_data['specVersion'] = '1.6'
+
+    tree = ComponentTree(input_data.get('components', []))
+
+    old_data_dict = dict()
+    patch = None
+    if old is not None:
+        if type(old) == dict:
+            old_data = old
+        else:
+            with stage('parse'), open(old) as f:
+                old_data = json.load(f)
+        old_tree = ComponentTree(old_data.get('components', []))
+        for component in old_tree.walk():
+            old_data_dict[(component['name'], component['version'])] = dict()
+            old_data_dict[(component['name'], component['version'])]['properties'] = component.get('properties', [])
+            old_data_dict[(component['name'], component['version'])]['purl'] = component.get('purl', '')
+            old_data_dict[(component['name'], component['version'])]['externalReferences'] = component.get('externalReferences', [])
+        if diff:
+            with stage('diff'):
+                sbom_diff = SbomDiff(old_tree, tree)
+                logging.info(f"сравнение с {old if type(old) != dict else 'предыдущей версией'}: добавлено {len(sbom_diff.added)}, "
+                             f"удалено {len(sbom_diff.removed)}, изменена версия {len(sbom_diff.version_changed)}, "
+                             f"без изменения версии {len(sbom_diff.unchanged)}")
+                logging.info('-'*50)
+                # a copy, the input is changed below
+                patch = copy.deepcopy(sbom_diff.patch(old_data, input_data))
+
+    def carried_over(component, field):
+        # the update replaces the field with its value from the previous version, enriching it would be wasted work
+        old = old_data_dict.get((component.get('name'), component.get('version')))
+        return bool(old and old[field])
+
+    if props or fix_all:
+        for i in tree.indices():
+            if carried_over(tree.components[i], 'properties'):
+                continue
+            tree.add_prop(i, 'GOST:attack_surface', 'yes')
+            tree.add_prop(i, 'GOST:security_function', 'yes')
+
+    if not app_name is None or fix_all:
+        product = _metadata_component(input_data)
+        if not app_name is None:
+            if 'name' in product:
+                logging.info(f"смена названия продукта {product['name']} -> {app_name}")
+                logging.info('-'*50)
+            product['name'] = app_name
+        elif not 'name' in product:
+            product['name'] = DEFAULT_VALUE
+
+    if not app_version is None or fix_all:
+        product = _metadata_component(input_data)
+        if not app_version is None:
+            if 'version' in product:
+                logging.info(f"смена версии продукта {product['version']} -> {app_version}")
+                logging.info('-'*50)
+            product['version'] = app_version
+        elif not 'version' in product:
+            product['version'] = DEFAULT_VALUE
+
+    if not manufacturer is None or fix_all:
+        product = _metadata_component(input_data)
+        if not 'manufacturer' in product:
+            product['manufacturer'] = dict()
+        if not manufacturer is None:
+            if 'name' in product['manufacturer']:
+                logging.info(f"смена названия организации {product['manufacturer']['name']} -> {manufacturer}")
+                logging.info('-'*50)
+            product['manufacturer']['name'] = manufacturer
+        elif not 'name' in product['manufacturer']:
+            product['manufacturer']['name'] = DEFAULT_VALUE
+
+    if ref or fix_all:
+        registry_index = RegistryIndex(registry)
+        if not registry_index.exists():
+            if registry:
+                raise FileNotFoundError(f'Registry index not found: {registry}')
+            registry_index = None
+        ref_finder = RefFinder(PURL_FILE, jobs, registry_index, offline)
+        purls = []
+        website_urls = []
+        for component in tree.walk():
+            if carried_over(component, 'externalReferences'):
+                continue
+            if 'purl' in component and not 'externalReferences' in component:
+                purls.append(component['purl'])
+            else:
+                website_ref = get_website(component.get('externalReferences', []))
+                if website_ref:
+                    website_urls.append(website_ref['url'])
+        try:
+            with stage('resolve_refs'):
+                ref_finder.resolve(purls, website_urls)
+                for component in tree.walk():
+                    if carried_over(component, 'externalReferences'):
+                        continue
+                    if 'purl' in component and not 'externalReferences' in component:
+                        url = ref_finder.process_purl(component['purl'])
+                        if url:
+                            component['externalReferences'] = [{'type':'vcs', 'url': url}]
+                    website_ref = get_website(component.get('externalReferences', []))
+                    if website_ref and ref_finder.is_repo(website_ref['url']):
+                        website_ref['type'] = 'vcs'
+                        logging.info(f"смена типа с 'website' на 'vcs' для {website_ref['url']}")
+                        logging.info('-'*50)
+        finally:
+            ref_finder.close()
+
+    if old is not None:
+        for i, component in enumerate(tree.walk()):
+            key = (component['name'], component['version'])
+            if key in old_data_dict:
+                if any(old_data_dict[key].values()):
+                    logging.info(f"для компонента {component} присвоение полю")
+                if old_data_dict[key]['properties']:
+                    logging.info(f"\"properties\" значения:\n{old_data_dict[key]['properties']}")
+                    component['properties'] = old_data_dict[key]['properties']
+                    tree.reset_props(i)
+                if old_data_dict[key]['purl']:
+                    logging.info(f"\"purl\" значения:\n{old_data_dict[key]['purl']}")
+                    component['purl'] = old_data_dict[key]['purl']
+                if old_data_dict[key]['externalReferences']:
+                    logging.info(f"\"externalReferences\" значения:\n{old_data_dict[key]['externalReferences']}")
+                    component['externalReferences'] = old_data_dict[key]['externalReferences']
+                if any(old_data_dict[key].values()):
+                    logging.info('-'*50)
+
+        old_product = old_data.get('metadata', {}).get('component', {})
+        if 'name' in old_product:
+            product = _metadata_component(input_data)
+            if not 'name' in product:
+                logging.info(f"перенос названия продукта: {old_product['name']}")
+                logging.info('-'*50)
+                product['name'] = old_product['name']
+        if 'version' in old_product:
+            product = _metadata_component(input_data)
+            if not 'version' in product:
+                logging.info(f"перенос версии продукта: {old_product['version']}")
+                logging.info('-'*50)
+                product['version'] = old_product['version']
+        if 'name' in old_product.get('manufacturer', {}):
+            product = _metadata_component(input_data)
+            if not 'manufacturer' in product:
+                product['manufacturer'] = dict()
+            if not 'name' in product['manufacturer']:
+                logging.info(f"перенос названия организации: {old_product['manufacturer']['name']}")
+                logging.info('-'*50)
+                product['manufacturer']['name'] = old_product['manufacturer']['name']
+
+    if 'metadata' in input_data:
+        input_data['metadata']['timestamp'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    if 'version' in input_data:
+        input_data['version'] += 1
+    return UpdateResult(input_data, encoding, patch)
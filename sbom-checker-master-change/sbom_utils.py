@@ -1,14 +1,36 @@
 # SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
 # SPDX-License-Identifier: Apache-2.0
 
-from collections import Counter
+from array import array
+from collections import Counter, deque, namedtuple
+import functools
 import json
 import os
 import platformdirs
+import re
+import shlex
+import signal
+import sqlite3
 import subprocess
+import tempfile
+import threading
+import time
 import urllib.parse
 
+try:
+    from toolbelt_profile import probe, stage
+except ImportError: # started without toolbelt.py, nothing is profiled
+    import contextlib
+    probe = stage = lambda name: contextlib.nullcontext()
+
 SP_TIMEOUT = 60 # timeout for subpocess
+CACHE_FILE = 'cache.sqlite'
+CACHE_TTL = 30 * 24 * 60 * 60 # seconds to keep positive check results
+NEGATIVE_CACHE_TTL = 24 * 60 * 60 # seconds to keep negative check results, they are re-checked sooner
+URL_CACHE_SIZE = 65536 # parsed urls kept in memory
+MEMO_SIZE = 65536 # check results of a ResultCache kept in memory, the least recently used ones are dropped first
+STREAM_CHUNK_SIZE = 1024 * 1024 # characters read at once by SbomStream
+WRITE_BUFFER_SIZE = 1024 * 1024 # bytes buffered by write_sbom before writing to disk
 
 pattern_dict = {
     'bitbucket.org': ((), ('commits', 'src', 'branch'), 2),
@@ -20,15 +42,85 @@ pattern_dict = {
     'hg.openjdk.org': ((), ('file', 'rev', 'shortlog'), 2),
 }
 
-def parse_repo_url(url):
-    parsed_url = urllib.parse.urlparse(url)
-    path = parsed_url.path.strip('/')
-    query = urllib.parse.parse_qs(parsed_url.query)
-    if 'commit' in query:
-        return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path), query['commit'][0]
-    if 'tag' in query:
-        return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path), query['tag'][0]
-    if parsed_url.netloc == 'git.altlinux.org':
+# (pairs of path segments, single path segments, number of leading segments of the repository path)
+# used for hosts missing from pattern_dict
+default_pattern = ((('-', 'commit'), ('-', 'commits'), ('-', 'tags'), ('-', 'tree'), ('-', 'blob'), ('-', 'releases'), ('releases', 'tag')),
+                   ('commit', 'blob', 'tree'), 2)
+
+class RepoUrlNormalizer(object):
+    """Splits urls of files, commits and tags into the repository url and the revision/path part.
+
+    pattern_dict is compiled into per-host lookup tables once; results are
+    memoized in a bounded LRU cache, so repeated urls are parsed only once.
+    """
+    def __init__(self, patterns=pattern_dict, cache_size=URL_CACHE_SIZE):
+        self._rules = {host: self._compile(*rule) for host, rule in patterns.items()}
+        self._default_rule = self._compile(*default_pattern)
+        self._special = {
+            'git.altlinux.org': self._parse_altlinux,
+            'git.netfilter.org': self._parse_netfilter,
+        }
+        self.normalize = functools.lru_cache(maxsize=cache_size)(self._normalize)
+
+    @staticmethod
+    def _compile(pairs, words, prefix):
+        # segment (pair) -> position in the pattern list, earlier patterns win
+        pair_ranks = dict()
+        for rank, pair in enumerate(pairs):
+            pair_ranks.setdefault(pair, rank)
+        word_ranks = dict()
+        for rank, word in enumerate(words):
+            word_ranks.setdefault(word, rank)
+        return pair_ranks, word_ranks, prefix
+
+    def normalize_many(self, urls):
+        """Returns {url: normalize(url)} for every distinct url."""
+        return {url: self.normalize(url) for url in dict.fromkeys(urls)}
+
+    def cache_info(self):
+        return self.normalize.cache_info()
+
+    def _normalize(self, url):
+        parsed_url = urllib.parse.urlparse(url)
+        path = parsed_url.path.strip('/')
+        base = parsed_url.scheme + "://" + parsed_url.netloc + "/"
+        if parsed_url.query:
+            query = urllib.parse.parse_qs(parsed_url.query)
+            if 'commit' in query:
+                return base + path, query['commit'][0]
+            if 'tag' in query:
+                return base + path, query['tag'][0]
+        special = self._special.get(parsed_url.netloc)
+        if special:
+            return special(parsed_url, base, path)
+        path_split = path.split('/')
+        pair_ranks, word_ranks, prefix = self._rules.get(parsed_url.netloc, self._default_rule)
+        idx = -1
+        flag = 0
+        best = len(pair_ranks)
+        for i in range(prefix, len(path_split) - 1):
+            rank = pair_ranks.get((path_split[i], path_split[i+1]), best)
+            if rank < best:
+                best = rank
+                idx = i
+                flag = 1
+                if rank == 0:
+                    break
+        if idx < 0:
+            best = len(word_ranks)
+            for i in range(prefix, len(path_split)):
+                rank = word_ranks.get(path_split[i], best)
+                if rank < best:
+                    best = rank
+                    idx = i
+                    if rank == 0:
+                        break
+        if idx > 0:
+            return base + '/'.join(path_split[:idx]), '/'.join(path_split[idx+1+flag:])
+        return None
+
+    @staticmethod
+    def _parse_altlinux(parsed_url, base, path):
         query = urllib.parse.parse_qs(parsed_url.query, separator=';')
         fpath = ''
         commit = ''
@@ -41,10 +133,12 @@ def parse_repo_url(url):
         if fpath:
             if not commit:
                 commit = 'HEAD'
-            return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path), commit+'/'+fpath
+            return base + path, commit+'/'+fpath
         else:
-            return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path), commit
-    if parsed_url.netloc == 'git.netfilter.org':
+            return base + path, commit
+
+    @staticmethod
+    def _parse_netfilter(parsed_url, base, path):
         query = urllib.parse.parse_qs(parsed_url.query)
         commit = ''
         if 'id' in query:
@@ -53,94 +147,681 @@ def parse_repo_url(url):
             commit = query['h'][0]
         path_split = path.split('/')
         if len(path_split) <= 2:
-            return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path_split[0]), commit
+            return base + path_split[0], commit
         if not commit:
             commit = 'HEAD'
-        return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + path_split[0]), commit+'/'+'/'.join(path_split[2:])
-    path_pair_list = []
-    path_split = path.split('/')
-    for idx in range(len(path_split) - 1):
-        path_pair_list.append((path_split[idx], path_split[idx+1]))
-    idx = -1
-    flag = 0
-    prefix = 2
-    if parsed_url.netloc in pattern_dict:
-        prefix = pattern_dict[parsed_url.netloc][2]
-        for s in pattern_dict[parsed_url.netloc][0]:
-            if len(path_pair_list) > prefix and s in path_pair_list[prefix:]:
-                idx = path_pair_list[prefix:].index(s) + prefix
-                flag = 1
-                break
-        else:
-            for s in pattern_dict[parsed_url.netloc][1]:
-                if len(path_split) > prefix and s in path_split[prefix:]:
-                    idx = path_split[prefix:].index(s) + prefix
-                    break
-    else:
-        for s in [('-', 'commit'), ('-', 'commits'), ('-', 'tags'), ('-', 'tree'), ('-', 'blob'), ('-', 'releases'), ('releases', 'tag')]:
-            if s in path_pair_list[prefix:]:
-                idx = path_pair_list[prefix:].index(s) + prefix
-                flag = 1
-                break
-        else:
-            for s in ['commit', 'blob', 'tree']:
-                if s in path_split[prefix:]:
-                    idx = path_split[prefix:].index(s) + prefix
-                    break
-    if idx > 0:
-        return (parsed_url.scheme + "://" + parsed_url.netloc + "/" + '/'.join(path_split[:idx])), '/'.join(path_split[idx+1+flag:])
-    return None
+        return base + path_split[0], commit+'/'+'/'.join(path_split[2:])
 
-def check_repo(url):
-    result = False
-    exc_list = []
+_url_normalizer = RepoUrlNormalizer()
+
+def parse_repo_url(url):
+    return _url_normalizer.normalize(url)
+
+def parse_repo_urls(urls):
+    return _url_normalizer.normalize_many(urls)
+
+# protocol name, probe command and whether success is decided by stdout rather than the return code;
+# a command is an argument list run without a shell or, for the fossil pipeline, a shell command
+# that gets the url quoted
+PROBES = (
+    ('GIT', ('git', 'ls-remote', '--', '{url}'), None),
+    ('SVN', ('svn', 'ls', '--', '{url}'), None),
+    ('HG', ('hg', 'identify', '--', '{url}'), None),
+    ('FOSSIL', 'curl --silent --url {url} 2>&1 | grep -iPzo "footer\\"?>\\sthis\\spage\\swas\\sgenerated\\sin\\sabout\\s(\\d+\\.\\d+)s\\sby\\sfossil"', 'footer'),
+)
+MAX_PROBES = 32 # overall limit of simultaneously running probe subprocesses
+MAX_HOST_PROBES = 4 # limit of simultaneously running probe subprocesses per host
+GIT_HTTP_PROBE = True # probe http(s) urls for git in-process before starting subprocesses
+GIT_HTTP_HEAD_SIZE = 4096
+GIT_HTTP_DRAIN_LIMIT = 1024 * 1024 # bigger responses are dropped instead of returning the connection to the pool
+GIT_DUMB_REFS_RE = re.compile(rb'[0-9a-f]{40}(?:[0-9a-f]{24})?\t')
+
+def _kill_probe(proc):
+    # probes run in their own session, so the whole pipeline (shell, git, curl, grep) is killed
     try:
-        res0 = subprocess.run(f'git ls-remote {url}', shell=True, capture_output=True, text=True, timeout=SP_TIMEOUT)
-        if res0.returncode != 0:
-            exc_list.append(f'ERROR/GIT: {res0.stderr}')
-            result = False
+        if hasattr(os, 'killpg'):
+            os.killpg(proc.pid, signal.SIGKILL)
         else:
-            result = True
-    except Exception as e:
-        exc_list.append(f'ERROR/GIT: {e}')
-        result = False
-    if not result:
-        try:
-            res1 = subprocess.run(f'svn ls {url}', shell=True, capture_output=True, text=True, timeout=SP_TIMEOUT)
-            if res1.returncode != 0:
-                exc_list.append(f'ERROR/SVN: {res1.stderr}')
-                result = False
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def _probe_command(cmd, url):
+    # the url comes from the sbom: it is never parsed by a shell
+    if isinstance(cmd, str):
+        return cmd.format(url=shlex.quote(url))
+    return [arg.format(url=url) for arg in cmd]
+
+async def _run_probe(cmd, host_sem, all_sem):
+    import asyncio
+    async with host_sem, all_sem:
+        with probe('subprocess'):
+            if isinstance(cmd, str):
+                proc = await asyncio.create_subprocess_shell(cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                                                             start_new_session=True)
             else:
-                result = True
-        except Exception as e:
-            exc_list.append(f'ERROR/SVN: {e}')
-            result = False
-    if not result:
+                proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                                                            start_new_session=True)
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), SP_TIMEOUT)
+            except asyncio.TimeoutError:
+                _kill_probe(proc)
+                await proc.wait()
+                raise subprocess.TimeoutExpired(cmd, SP_TIMEOUT)
+            except asyncio.CancelledError:
+                _kill_probe(proc)
+                await proc.wait()
+                raise
+    return proc.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace')
+
+async def _check_protocol(name, cmd, marker, host_sem, all_sem):
+    try:
+        returncode, stdout, stderr = await _run_probe(cmd, host_sem, all_sem)
+    except Exception as e:
+        return False, f'ERROR/{name}: {e}'
+    if marker:
+        if marker in stdout:
+            return True, ''
+        if returncode != 0:
+            return False, f'ERROR/{name}: {stderr}'
+        return False, f'ERROR/{name}: didn\'t find autogenerated fossil footer on this page'
+    if returncode != 0:
+        return False, f'ERROR/{name}: {stderr}'
+    return True, ''
+
+class GitHttpProber(object):
+    """Git smart-HTTP discovery (GET info/refs?service=git-upload-pack) over keep-alive connections pooled per host."""
+    def __init__(self, pool_size=MAX_HOST_PROBES):
+        from requests import Session, adapters
+        self._session = Session()
+        adapter = adapters.HTTPAdapter(pool_connections=MAX_PROBES, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter=adapter)
+        self._session.mount('https://', adapter=adapter)
+        self._session.headers['User-Agent'] = 'git/sbom-checker'
+
+    def probe(self, url):
+        """Returns (True, '') for a git repository, (False, error) if the server answered
+        that there is none and (None, error) if the answer is inconclusive.
+        """
+        refs_url = url.rstrip('/') + '/info/refs?service=git-upload-pack'
         try:
-            res2 = subprocess.run(f'hg identify {url}', shell=True, capture_output=True, text=True, timeout=SP_TIMEOUT)
-            if res2.returncode != 0:
-                exc_list.append(f'ERROR/HG: {res2.stderr}')
-                result = False
-            else:
-                result = True
+            with probe('http'), self._session.get(refs_url, stream=True, timeout=SP_TIMEOUT) as res:
+                if res.status_code in (404, 410):
+                    return False, f'{refs_url}: HTTP {res.status_code} {res.reason}'
+                if res.status_code != 200:
+                    return None, f'{refs_url}: HTTP {res.status_code} {res.reason}'
+                # one iterator over the body: requests refuses a second one once the body is read
+                chunks = res.iter_content(GIT_HTTP_HEAD_SIZE)
+                if res.headers.get('Content-Type', '').startswith('application/x-git-upload-pack-advertisement'):
+                    self._drain(chunks)
+                    return True, ''
+                # dumb http servers return the plain list of refs
+                head = next(chunks, b'')
+                self._drain(chunks)
+                if not head:
+                    return None, f'{refs_url}: empty response'
+                if GIT_DUMB_REFS_RE.match(head):
+                    return True, ''
+                return False, f'{refs_url}: not a git repository'
         except Exception as e:
-            exc_list.append(f'ERROR/HG: {e}')
-            result = False
-    if not result:
-        try:
-            res3 = subprocess.run(f'curl --silent {url} 2>&1 | grep -iPzo "footer\\"?>\sthis\spage\swas\sgenerated\sin\sabout\s(\d+\.\d+)s\sby\sfossil"', shell=True, capture_output=True, text=True, timeout=SP_TIMEOUT)
-            if 'footer' in res3.stdout:
+            return None, str(e)
+
+    def _drain(self, chunks):
+        # the connection goes back to the pool only after the body is read
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            if size > GIT_HTTP_DRAIN_LIMIT:
+                break
+
+_git_http_prober = None
+_git_http_prober_lock = threading.Lock()
+
+def git_http_prober():
+    global _git_http_prober
+    with _git_http_prober_lock:
+        if _git_http_prober is None:
+            _git_http_prober = GitHttpProber()
+    return _git_http_prober
+
+async def _check_repo(url, host_sem, all_sem):
+    import asyncio
+    errors = dict()
+    probes = PROBES
+    if GIT_HTTP_PROBE and urllib.parse.urlparse(url).scheme in ('http', 'https'):
+        async with host_sem, all_sem:
+            is_git, error = await asyncio.get_running_loop().run_in_executor(None, git_http_prober().probe, url)
+        if is_git:
+            return True, ''
+        if is_git is not None:
+            # the server answered that there is no git repository, only the other protocols are left to probe
+            errors['GIT'] = f'ERROR/GIT: {error}'
+            probes = [probe for probe in PROBES if probe[0] != 'GIT']
+    tasks = {asyncio.ensure_future(_check_protocol(name, _probe_command(cmd, url), marker, host_sem, all_sem)): name
+             for name, cmd, marker in probes}
+    result = False
+    pending = set(tasks)
+    while pending and not result:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            ok, error = task.result()
+            if ok:
                 result = True
-            elif res3.returncode != 0:
-                exc_list.append(f'ERROR/FOSSIL: {res3.stderr}')
-                result = False
             else:
-                exc_list.append(f'ERROR/FOSSIL: didn\'t find autogenerated fossil footer on this page')
-                result = False
-        except Exception as e:
-            exc_list.append(f'ERROR/FOSSIL: {e}')
-            result = False
-    return result, '\n'.join(exc_list)
+                errors[tasks[task]] = error
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    # keep the order of the messages independent of which probe finished first
+    return result, '\n'.join(errors[name] for name, _, _ in PROBES if name in errors)
+
+async def _check_repos(urls, max_probes, max_host_probes):
+    import asyncio
+    all_sem = asyncio.Semaphore(max_probes)
+    host_sems = dict()
+    coros = []
+    for url in urls:
+        host = urllib.parse.urlparse(url).hostname or ''
+        if not host in host_sems:
+            host_sems[host] = asyncio.Semaphore(max_host_probes)
+        coros.append(_check_repo(url, host_sems[host], all_sem))
+    return await asyncio.gather(*coros)
+
+def check_repos(urls, max_probes=MAX_PROBES, max_host_probes=MAX_HOST_PROBES):
+    """Checks urls for git/svn/hg/fossil repositories.
+
+    Protocols of every url are probed concurrently, the first successful probe
+    cancels the rest. Returns {url: (result, error text)}.
+    """
+    # asyncio and requests are imported on first use, most scripts never check repositories
+    import asyncio
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return dict()
+    with stage('check_repos'):
+        return dict(zip(urls, asyncio.run(_check_repos(urls, max_probes, max_host_probes))))
+
+def check_repo(url):
+    return check_repos([url])[url]
+
+def get_prop(arr, name):
+    for elem in arr:
+        if elem.get('name', '') == name:
+            return elem.get('value', '')
+    return ''
+
+def has_prop(arr, name):
+    for elem in arr:
+        if elem.get('name', '') == name:
+            return True
+    return False
+
+def eval_prop(components, name):
+    vals = set()
+    for comp in components:
+        vals.add(get_prop(comp.get('properties', []), name))
+    if 'yes' in vals:
+        return 'yes'
+    if 'indirect' in vals:
+        return 'indirect'
+    if vals == {'no'}:
+        return 'no'
+    return ''
+
+class ComponentTree(object):
+    """Nested "components" of an sbom flattened once in breadth-first order.
+
+    Component i is self.components[i]; parents[i] is the index of its parent
+    (-1 for top-level components), depths[i] its nesting level, and its
+    children occupy indices first_child[i] .. first_child[i] + child_count[i] - 1.
+    Top-level components come first, so they are indices 0 .. top_count - 1.
+    """
+    def __init__(self, components):
+        self.components = [c for c in components if type(c) == dict] if type(components) == list else []
+        self.top_count = len(self.components)
+        self.parents = array('i', [-1] * self.top_count)
+        self.depths = array('i', [0] * self.top_count)
+        self.first_child = array('i')
+        self.child_count = array('i')
+        self.by_ref = dict()
+        self._props = dict()
+        idx = 0
+        while idx < len(self.components):
+            component = self.components[idx]
+            children = component.get('components')
+            self.first_child.append(len(self.components))
+            if type(children) == list:
+                children = [c for c in children if type(c) == dict]
+                self.components += children
+                self.parents.extend([idx] * len(children))
+                self.depths.extend([self.depths[idx] + 1] * len(children))
+                self.child_count.append(len(children))
+            else:
+                self.child_count.append(0)
+            ref = component.get('bom-ref')
+            if type(ref) == str and not ref in self.by_ref:
+                self.by_ref[ref] = idx
+            idx += 1
+
+    def __len__(self):
+        return len(self.components)
+
+    def __iter__(self):
+        return iter(self.components)
+
+    def is_leaf(self, idx):
+        return self.child_count[idx] == 0
+
+    def indices(self, leaf_only=False):
+        for idx in range(len(self.components)):
+            if not leaf_only or self.child_count[idx] == 0:
+                yield idx
+
+    def walk(self, leaf_only=False):
+        """Yields components in the same breadth-first order as a queue-based walk of the tree."""
+        for idx in self.indices(leaf_only):
+            yield self.components[idx]
+
+    def children(self, idx):
+        return range(self.first_child[idx], self.first_child[idx] + self.child_count[idx])
+
+    def descendants(self, idx):
+        """Yields indices of the subtree below idx breadth-first."""
+        # children of consecutive components are stored consecutively, so every level of a subtree is a range
+        start, end = self.first_child[idx], self.first_child[idx] + self.child_count[idx]
+        while start < end:
+            yield from range(start, end)
+            start, end = self.first_child[start], self.first_child[end - 1] + self.child_count[end - 1]
+
+    def props(self, idx):
+        """Returns {name: value} of the component properties, the first value wins as in get_prop."""
+        props = self._props.get(idx)
+        if props is None:
+            props = dict()
+            arr = self.components[idx].get('properties', [])
+            if type(arr) == list:
+                for elem in arr:
+                    if type(elem) == dict:
+                        props.setdefault(elem.get('name', ''), elem.get('value', ''))
+            self._props[idx] = props
+        return props
+
+    def get_prop(self, idx, name):
+        return self.props(idx).get(name, '')
+
+    def has_prop(self, idx, name):
+        return name in self.props(idx)
+
+    def add_prop(self, idx, name, value):
+        """Appends the property unless the component already has it."""
+        if not self.has_prop(idx, name):
+            self.components[idx].setdefault('properties', []).append({'name': name, 'value': value})
+            self._props[idx][name] = value
+
+    def reset_props(self, idx):
+        """Must be called after the "properties" of a component are replaced."""
+        self._props.pop(idx, None)
+
+    def pointer(self, idx):
+        """JSON pointer of the component in the sbom, e.g. /components/2/components/0."""
+        positions = []
+        while idx >= 0:
+            parent = self.parents[idx]
+            positions.append(idx - self.first_child[parent] if parent >= 0 else idx)
+            idx = parent
+        return ''.join(f'/components/{pos}' for pos in reversed(positions))
+
+def purl_without_version(purl):
+    """Strips the version, qualifiers and subpath from a purl."""
+    purl = purl.split('#', 1)[0].split('?', 1)[0]
+    name_start = purl.rfind('/') + 1
+    at = purl.find('@', name_start)
+    return purl[:at] if at >= 0 else purl
+
+def _pointer_token(key):
+    return key.replace('~', '~0').replace('/', '~1')
+
+class SbomDiff(object):
+    """Structural diff of the nested components of two sboms.
+
+    Components are matched by purl without version, then by bom-ref, then by
+    (name, version) and finally by name alone; every pass only considers
+    components left unmatched by the previous ones, in tree order. Matched
+    pairs are (old index, new index) in the ComponentTree of each side.
+    """
+    def __init__(self, old_tree, new_tree):
+        self.old_tree = old_tree
+        self.new_tree = new_tree
+        self.new_to_old = dict()
+        old_left = list(old_tree.indices())
+        new_left = list(new_tree.indices())
+        for key in (self._purl_key, self._ref_key, self._name_version_key, self._name_key):
+            candidates = dict()
+            for idx in old_left:
+                k = key(old_tree.components[idx])
+                if k is not None:
+                    candidates.setdefault(k, deque()).append(idx)
+            still_left = []
+            for idx in new_left:
+                k = key(new_tree.components[idx])
+                if k is not None and candidates.get(k):
+                    self.new_to_old[idx] = candidates[k].popleft()
+                else:
+                    still_left.append(idx)
+            new_left = still_left
+            matched = set(self.new_to_old.values())
+            old_left = [idx for idx in old_left if not idx in matched]
+        self.added = new_left
+        self.removed = old_left
+        self.unchanged = []
+        self.version_changed = []
+        for new_idx in new_tree.indices():
+            if new_idx in self.new_to_old:
+                old_idx = self.new_to_old[new_idx]
+                same = old_tree.components[old_idx].get('version') == new_tree.components[new_idx].get('version')
+                (self.unchanged if same else self.version_changed).append((old_idx, new_idx))
+
+    @staticmethod
+    def _purl_key(component):
+        purl = component.get('purl')
+        return purl_without_version(purl) if type(purl) == str and purl else None
+
+    @staticmethod
+    def _ref_key(component):
+        ref = component.get('bom-ref')
+        return ref if type(ref) == str and ref else None
+
+    @staticmethod
+    def _name_version_key(component):
+        name, version = component.get('name'), component.get('version')
+        return (name, version) if type(name) == str and type(version) == str else None
+
+    @staticmethod
+    def _name_key(component):
+        name = component.get('name')
+        return name if type(name) == str else None
+
+    def patch(self, old_data, new_data):
+        """JSON patch (RFC 6902) turning old_data, the sbom of old_tree, into new_data, the sbom of new_tree.
+
+        Matched components that keep their parent and their order among its
+        components are patched field by field, every other component is removed
+        or added whole. Pointers are absolute, every operation applies to the
+        result of the previous ones.
+        """
+        old_idx = {id(c): idx for idx, c in enumerate(self.old_tree.components)}
+        new_idx = {id(c): idx for idx, c in enumerate(self.new_tree.components)}
+        patch = []
+        self._patch_object(patch, '', old_data, new_data, old_idx, new_idx)
+        return patch
+
+    def _patch_object(self, patch, path, old, new, old_idx, new_idx):
+        for key in old:
+            if not key in new:
+                patch.append({'op': 'remove', 'path': f'{path}/{_pointer_token(key)}'})
+        for key, value in new.items():
+            key_path = f'{path}/{_pointer_token(key)}'
+            if not key in old:
+                patch.append({'op': 'add', 'path': key_path, 'value': value})
+            elif key == 'components' and type(old[key]) == list and type(value) == list:
+                self._patch_array(patch, key_path, old[key], value, old_idx, new_idx)
+            elif old[key] != value:
+                patch.append({'op': 'replace', 'path': key_path, 'value': value})
+
+    def _patch_array(self, patch, path, old_list, new_list, old_idx, new_idx):
+        old_positions = {id(c): i for i, c in enumerate(old_list)}
+        # (new position, old position) of matched components kept in this array, in the order of both
+        kept = []
+        for j, component in enumerate(new_list):
+            old_component = None
+            if id(component) in new_idx and new_idx[id(component)] in self.new_to_old:
+                old_component = self.old_tree.components[self.new_to_old[new_idx[id(component)]]]
+            i = old_positions.get(id(old_component))
+            if i is not None and (not kept or i > kept[-1][1]):
+                kept.append((j, i))
+        kept_old = {i for _, i in kept}
+        kept_new = {j for j, _ in kept}
+        # removals from the end keep the positions of the rest; after them the kept components are in
+        # the new order, so additions in ascending positions land where they belong
+        for i in reversed(range(len(old_list))):
+            if not i in kept_old:
+                patch.append({'op': 'remove', 'path': f'{path}/{i}'})
+        for j, component in enumerate(new_list):
+            if not j in kept_new:
+                patch.append({'op': 'add', 'path': f'{path}/{j}', 'value': component})
+        for j, i in kept:
+            if type(old_list[i]) == dict and type(new_list[j]) == dict:
+                self._patch_object(patch, f'{path}/{j}', old_list[i], new_list[j], old_idx, new_idx)
+
+class SbomIndex(object):
+    """Hash indexes over every component of the nested tree, built in a single pass.
+
+    Lookups by manufacturer/supplier name, purl, (name, version) and bom-ref
+    return lists of component indices in tree order.
+    """
+    def __init__(self, data, tree=None):
+        self.tree = tree if tree is not None else ComponentTree(data.get('components', []))
+        metadata = data.get('metadata', {})
+        self.metadata_component = metadata.get('component', {}) if type(metadata) == dict else {}
+        self.by_manufacturer = dict()
+        self.by_supplier = dict()
+        self.by_purl = dict()
+        self.by_package = dict() # purl without version
+        self.by_name = dict()
+        self.by_name_version = dict()
+        self.by_ref = dict()
+        for idx, component in enumerate(self.tree.components):
+            for field, index in (('manufacturer', self.by_manufacturer), ('supplier', self.by_supplier)):
+                org = component.get(field)
+                if type(org) == dict and type(org.get('name')) == str:
+                    index.setdefault(org['name'], []).append(idx)
+            purl = component.get('purl')
+            if type(purl) == str:
+                self.by_purl.setdefault(purl, []).append(idx)
+                self.by_package.setdefault(purl_without_version(purl), []).append(idx)
+            name = component.get('name')
+            if type(name) == str:
+                self.by_name.setdefault(name, []).append(idx)
+                self.by_name_version.setdefault((name, component.get('version')), []).append(idx)
+            ref = component.get('bom-ref')
+            if type(ref) == str:
+                self.by_ref.setdefault(ref, []).append(idx)
+
+    def components(self, indices):
+        return [self.tree.components[idx] for idx in indices]
+
+    def find_manufacturer(self, name):
+        return self.by_manufacturer.get(name, [])
+
+    def find_supplier(self, name):
+        return self.by_supplier.get(name, [])
+
+    def find_purl(self, purl):
+        """A purl without a version matches every version of the package."""
+        if purl_without_version(purl) == purl:
+            return self.by_package.get(purl, [])
+        return self.by_purl.get(purl, [])
+
+    def find_name(self, name, version=None):
+        if version is None:
+            return self.by_name.get(name, [])
+        return self.by_name_version.get((name, version), [])
+
+    def find_ref(self, ref):
+        return self.by_ref.get(ref, [])
+
+def _strongly_connected(offsets, targets):
+    """Iterative Tarjan's algorithm over a graph in compressed adjacency form, yields lists of node ids."""
+    size = len(offsets) - 1
+    index = array('i', [-1] * size)
+    low = array('i', [0] * size)
+    on_stack = bytearray(size)
+    stack = []
+    counter = 0
+    for root in range(size):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [[root, offsets[root]]]
+        while work:
+            frame = work[-1]
+            node, pos = frame
+            if pos < offsets[node + 1]:
+                frame[1] += 1
+                succ = targets[pos]
+                if index[succ] == -1:
+                    index[succ] = low[succ] = counter
+                    counter += 1
+                    stack.append(succ)
+                    on_stack[succ] = 1
+                    work.append([succ, offsets[succ]])
+                elif on_stack[succ] and index[succ] < low[node]:
+                    low[node] = index[succ]
+                continue
+            work.pop()
+            if work and low[node] < low[work[-1][0]]:
+                low[work[-1][0]] = low[node]
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    succ = stack.pop()
+                    on_stack[succ] = 0
+                    component.append(succ)
+                    if succ == node:
+                        break
+                yield component
+
+def _find_cycle(start, members, offsets, targets):
+    """Breadth-first search inside one strongly connected component for a path leading back to start."""
+    parent = {start: -1}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for pos in range(offsets[node], offsets[node + 1]):
+            succ = targets[pos]
+            if succ == start and node != start:
+                path = [node]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                return list(reversed(path)) + [start]
+            if succ in members and not succ in parent:
+                parent[succ] = node
+                queue.append(succ)
+    return [start]
+
+def _json_path(keys):
+    return ''.join(f"[{k!r}]" for k in keys)
+
+class SbomError(namedtuple('SbomError', 'message path')):
+    """An error found in an sbom: the message as sbom-checker.py prints it and the keys leading to the wrong value."""
+    __slots__ = ()
+
+    @property
+    def json_path(self):
+        # as ValidationError.json_path of jsonschema
+        return '$' + ''.join(f'[{k}]' if type(k) == int else f'.{k}' for k in self.path)
+
+class DependencyChecker(object):
+    """Finds duplicate bom-refs, references in "dependencies" to missing bom-refs and dependency cycles
+    in O(V+E) without recursion. bom-refs can be added part by part, e.g. while an sbom is streamed.
+    """
+    def __init__(self):
+        # bom-ref -> paths of the objects declaring it
+        self.declared = dict()
+
+    def declare(self, obj, path):
+        ref = obj.get('bom-ref')
+        if type(ref) == str:
+            self.declared.setdefault(ref, []).append(path)
+
+    def add_tree(self, tree, prefix=(), offset=0):
+        """Declares the components of a tree whose top-level components start at prefix['components'][offset]."""
+        paths = [None] * len(tree)
+        for i, component in enumerate(tree.components):
+            parent = tree.parents[i]
+            if parent < 0:
+                paths[i] = prefix + ('components', offset + i)
+            else:
+                paths[i] = paths[parent] + ('components', i - tree.first_child[parent])
+            self.declare(component, paths[i])
+
+    def add_document(self, data, tree=None):
+        """Declares metadata.component, services and, unless they are added separately, the components."""
+        metadata = data.get('metadata')
+        if type(metadata) == dict and type(metadata.get('component')) == dict:
+            self.declare(metadata['component'], ('metadata', 'component'))
+            self.add_tree(ComponentTree(metadata['component'].get('components', [])), ('metadata', 'component'))
+        if tree is not None:
+            self.add_tree(tree)
+        # schema-invalid values are reported by the schema check, here they are skipped like in ComponentTree
+        services = [(data, ())]
+        while services:
+            service, path = services.pop()
+            if path:
+                self.declare(service, path)
+            children = service.get('services')
+            for i, s in enumerate(children if type(children) == list else []):
+                if type(s) == dict:
+                    services.append((s, path + ('services', i)))
+
+    def iter_errors(self, dependencies):
+        """Yields an SbomError for every problem found."""
+        declared = self.declared
+        for ref, ref_paths in declared.items():
+            if len(ref_paths) > 1:
+                yield SbomError(f'bom-ref "{ref}" не уникален:\n' + '\n'.join('On instance' + _json_path(p) for p in ref_paths),
+                                ref_paths[1])
+
+        node_ids = {ref: n for n, ref in enumerate(declared)}
+        edges = []
+        for i, dep in enumerate(dependencies if type(dependencies) == list else []):
+            if type(dep) != dict:
+                continue
+            ref = dep.get('ref')
+            source = node_ids.get(ref)
+            if source is None:
+                path = ('dependencies', i, 'ref')
+                yield SbomError(f'ссылка на несуществующий bom-ref "{ref}"\n\nOn instance' + _json_path(path), path)
+            for field in ('dependsOn', 'provides'):
+                target_refs = dep.get(field, [])
+                for j, target_ref in enumerate(target_refs if type(target_refs) == list else []):
+                    target = node_ids.get(target_ref)
+                    if target is None:
+                        path = ('dependencies', i, field, j)
+                        yield SbomError(f'ссылка на несуществующий bom-ref "{target_ref}"\n\nOn instance' + _json_path(path), path)
+                    elif field == 'dependsOn' and source is not None:
+                        edges.append((source, target))
+
+        # compressed adjacency: successors of node n are targets[offsets[n]:offsets[n + 1]]
+        offsets = array('i', [0] * (len(node_ids) + 1))
+        for source, _ in edges:
+            offsets[source + 1] += 1
+        for n in range(len(node_ids)):
+            offsets[n + 1] += offsets[n]
+        targets = array('i', [0] * len(edges))
+        fill = array('i', offsets[:-1])
+        for source, target in edges:
+            targets[fill[source]] = target
+            fill[source] += 1
+
+        refs = list(node_ids)
+        cycles = []
+        for members in _strongly_connected(offsets, targets):
+            if len(members) > 1:
+                cycles.append(_find_cycle(min(members), set(members), offsets, targets))
+        for source in {source for source, target in edges if source == target}:
+            cycles.append([source, source])
+        for cycle in sorted(cycles):
+            yield SbomError('циклическая зависимость: ' + ' -> '.join(f'"{refs[n]}"' for n in cycle), ('dependencies',))
+
+def iter_dependency_errors(data, tree=None):
+    checker = DependencyChecker()
+    checker.add_document(data, tree if tree is not None else ComponentTree(data.get('components', [])))
+    return checker.iter_errors(data.get('dependencies', []))
 
 def validate_no_duplicate_keys(list_of_pairs):
     key_count = Counter(k for k,v in list_of_pairs)
@@ -152,27 +833,408 @@ def validate_no_duplicate_keys(list_of_pairs):
 
 def opener(filename, pairs=False):
     encoding = None
-    try:
-        with open(filename) as f:
-            data = json.load(f, object_pairs_hook=(validate_no_duplicate_keys if pairs else None))
-    except UnicodeDecodeError:
-        with open(filename, encoding='utf-8') as f: # duplicate keys detection
-            data = json.load(f, object_pairs_hook=(validate_no_duplicate_keys if pairs else None))
-        encoding = 'utf-8'
-    except json.decoder.JSONDecodeError:
-        with open(filename, encoding='utf-8-sig') as f: # duplicate keys detection
-            data = json.load(f, object_pairs_hook=(validate_no_duplicate_keys if pairs else None))
-        encoding = 'utf-8-sig'
+    with stage('parse'):
+        try:
+            with open(filename) as f:
+                data = json.load(f, object_pairs_hook=(validate_no_duplicate_keys if pairs else None))
+        except UnicodeDecodeError:
+            with open(filename, encoding='utf-8') as f: # duplicate keys detection
+                data = json.load(f, object_pairs_hook=(validate_no_duplicate_keys if pairs else None))
+            encoding = 'utf-8'
+        except json.decoder.JSONDecodeError:
+            with open(filename, encoding='utf-8-sig') as f: # duplicate keys detection
+                data = json.load(f, object_pairs_hook=(validate_no_duplicate_keys if pairs else None))
+            encoding = 'utf-8-sig'
     return data, encoding
 
+def parse_sbom(data, pairs=False):
+    """Parses an sbom from bytes, e.g. received over the network; with or without the byte order mark."""
+    with stage('parse'):
+        return json.loads(data.decode('utf-8-sig'), object_pairs_hook=(validate_no_duplicate_keys if pairs else None))
+
+def condense_product(data, keys):
+    """The component of the sbom product with the top-level keys of the sbom merged in."""
+    new_data = data['metadata']['component'].copy()
+    for key in keys:
+        if key in data:
+            new_data[key] = data[key]
+    # a copy, the properties are added to the product component only, not to the sbom it comes from
+    new_data['properties'] = list(new_data.get('properties', []))
+    if not get_prop(new_data.get('properties', []), 'GOST:attack_surface'):
+        new_data['properties'].append({
+            "name": 'GOST:attack_surface',
+            "value": eval_prop(data.get('components', []), 'GOST:attack_surface')
+        })
+    if not get_prop(new_data.get('properties', []), 'GOST:security_function'):
+        new_data['properties'].append({
+            "name": 'GOST:security_function',
+            "value": eval_prop(data.get('components', []), 'GOST:security_function')
+        })
+    return new_data
+
+def sbom_source(source):
+    """(data, encoding) of a file name as opener returns them; an sbom already in memory has no encoding of its own."""
+    return (source, None) if type(source) == dict else opener(source)
+
+def product_component(source, keys):
+    """Condenses an sbom (a file name or the sbom itself) into the component of its product for sbom-unifier.
+
+    Returns (component, encoding of the file); runs in worker processes, so
+    only the condensed component is sent back.
+    """
+    data, encoding = sbom_source(source)
+    return condense_product(data, keys), encoding
+
+def product_tree(source, keys):
+    """Same as product_component, also returns the "dependencies" of the sbom for SbomMerger."""
+    data, encoding = sbom_source(source)
+    return condense_product(data, keys), data.get('dependencies', []), encoding
+
+class SbomMerger(object):
+    """Folds the component trees of several sboms into one (sbom-unifier --deep-merge).
+
+    Components are deduplicated through a hash index on purl, or on
+    (name, version, hashes) for components without purl: the first one is
+    kept, later duplicates are dropped and their children take their place.
+    bom-refs already used by earlier inputs get a numeric suffix, references
+    to dropped duplicates are redirected to the kept component and the
+    "dependencies" of all inputs are merged by ref. Every component is
+    visited once, so merging is linear in the total number of components.
+    """
+    def __init__(self):
+        self._index = dict() # dedup key -> bom-ref of the kept component (None if it has none)
+        self._refs = set()
+        self._dependencies = dict() # ref -> {"dependsOn"/"provides": {target: None}}
+
+    @staticmethod
+    def _key(component):
+        purl = component.get('purl')
+        if type(purl) == str and purl:
+            return purl
+        name = component.get('name')
+        if type(name) != str:
+            return None
+        hashes = component.get('hashes')
+        hashes = tuple(sorted((str(h.get('alg')), str(h.get('content'))) for h in hashes if type(h) == dict)) \
+            if type(hashes) == list else ()
+        return (name, str(component.get('version')), hashes)
+
+    def _keep(self, component, refs):
+        ref = component.get('bom-ref')
+        if type(ref) == str:
+            new_ref = ref
+            n = 1
+            while new_ref in self._refs:
+                n += 1
+                new_ref = f'{ref}-{n}'
+            self._refs.add(new_ref)
+            refs.setdefault(ref, new_ref)
+            component['bom-ref'] = new_ref
+
+    def _fold(self, components, refs):
+        folded = []
+        end = object()
+        stack = [(iter(components), folded)]
+        while stack:
+            items, out = stack[-1]
+            component = next(items, end)
+            if component is end:
+                stack.pop()
+                continue
+            if type(component) != dict:
+                out.append(component)
+                continue
+            children = component.get('components')
+            key = self._key(component)
+            if key is not None and key in self._index:
+                ref = component.get('bom-ref')
+                if type(ref) == str:
+                    refs.setdefault(ref, self._index[key])
+                if type(children) == list:
+                    stack.append((iter(children), out))
+                continue
+            component = dict(component)
+            self._keep(component, refs)
+            if key is not None:
+                self._index[key] = component.get('bom-ref')
+            out.append(component)
+            if type(children) == list:
+                component['components'] = []
+                stack.append((iter(children), component['components']))
+        return folded
+
+    def add(self, product, dependencies=()):
+        """Returns the product component with its components folded into the merged tree."""
+        refs = dict() # bom-refs of this input -> bom-refs in the merged sbom
+        product = dict(product)
+        self._keep(product, refs)
+        if type(product.get('components')) == list:
+            product['components'] = self._fold(product['components'], refs)
+        for dep in dependencies if type(dependencies) == list else []:
+            if type(dep) != dict or type(dep.get('ref')) != str:
+                continue
+            ref = refs.get(dep['ref'], dep['ref'])
+            if ref is None:
+                continue
+            entry = self._dependencies.setdefault(ref, dict())
+            for field in ('dependsOn', 'provides'):
+                if type(dep.get(field)) == list:
+                    targets = entry.setdefault(field, dict())
+                    for target in dep[field]:
+                        if type(target) == str:
+                            target = refs.get(target, target)
+                            if target is not None and target != ref:
+                                targets[target] = None
+        return product
+
+    def iter_dependencies(self):
+        """Yields the merged "dependencies" items, to be consumed after every input was added."""
+        for ref, entry in self._dependencies.items():
+            dep = {'ref': ref}
+            for field, targets in entry.items():
+                dep[field] = list(targets)
+            yield dep
+
+def _sbom_chunks(data, compact):
+    if compact:
+        dumps = functools.partial(json.dumps, ensure_ascii=False, separators=(',', ':'))
+        key_sep, nl1, nl2 = ':', '', ''
+    else:
+        dumps = functools.partial(json.dumps, ensure_ascii=False, indent=2)
+        key_sep, nl1, nl2 = ': ', '\n  ', '\n    '
+    if not data:
+        yield '{}'
+        return
+    for n, (key, value) in enumerate(data.items()):
+        yield ('{' if n == 0 else ',') + nl1 + dumps(key) + key_sep
+        if type(value) == list or (hasattr(value, '__next__') and not isinstance(value, (str, dict))):
+            # arrays are written item by item, they may be generators
+            empty = True
+            for item in value:
+                yield ('[' if empty else ',') + nl2 + dumps(item).replace('\n', nl2)
+                empty = False
+            yield '[]' if empty else nl1 + ']'
+        else:
+            yield dumps(value).replace('\n', nl1)
+    yield ('\n' if not compact else '') + '}'
+
+def write_sbom(data, filename, encoding=None, compact=False):
+    """Writes data exactly as json.dump(data, f, indent=2, ensure_ascii=False) does,
+    or without whitespace in compact mode.
+
+    Top-level arrays (e.g. "components") are encoded item by item and may be
+    given as iterators. The output goes to a temporary file in the same
+    directory that replaces filename only once it is complete.
+    """
+    filename = os.path.abspath(filename)
+    if os.path.exists(filename):
+        mode = os.stat(filename).st_mode & 0o777
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    fd, tmp_name = tempfile.mkstemp(prefix='.' + os.path.basename(filename) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(filename))
+    try:
+        with stage('write'), open(fd, 'w', encoding=encoding, buffering=WRITE_BUFFER_SIZE) as f:
+            for chunk in _sbom_chunks(data, compact):
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_name)
+        except OSError:
+            pass
+        raise
+
+class ResultCache(object):
+    """Check results stored per key in an sqlite database in the user cache directory.
+
+    Every entry keeps the time it was checked; positive results expire after
+    `ttl` seconds and negative ones after `negative_ttl` seconds. Entries are
+    written one by one, so several processes can use the same cache at once.
+    Up to `memo_size` entries read or written are kept in memory until they
+    expire, so a long-running process (sbom-check-server.py) doesn't grow.
+    """
+    def __init__(self, table, ttl=CACHE_TTL, negative_ttl=NEGATIVE_CACHE_TTL, filename=None, memo_size=MEMO_SIZE):
+        self._table = table
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._filename = filename or platformdirs.user_cache_path('sbom-checker', ensure_exists=True) / CACHE_FILE
+        self._conn = None
+        # insertion order is the order of use, the first entry is the least recently used one
+        self._memo = dict()
+        self._memo_size = memo_size
+        self._lock = threading.Lock()
+
+    def _remember(self, key, entry, expires):
+        # called with the lock held
+        self._memo.pop(key, None)
+        self._memo[key] = (entry, expires)
+        if len(self._memo) > self._memo_size:
+            del self._memo[next(iter(self._memo))]
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self._filename, timeout=SP_TIMEOUT, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {self._table} '
+                         '(key TEXT PRIMARY KEY, value TEXT, ok INTEGER, error TEXT, checked REAL)')
+            now = time.time()
+            conn.execute(f'DELETE FROM {self._table} WHERE (ok AND checked < ?) OR (NOT ok AND checked < ?)',
+                         (now - self._ttl, now - self._negative_ttl))
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        """Returns (value, error) for a key that was checked and has not expired yet, else None."""
+        with self._lock:
+            if key in self._memo:
+                entry, expires = self._memo.pop(key)
+                if expires > time.time():
+                    self._memo[key] = (entry, expires)
+                    return entry
+            row = self._connect().execute(f'SELECT value, ok, error, checked FROM {self._table} WHERE key = ?',
+                                          (key,)).fetchone()
+            if row is None:
+                return None
+            value, ok, error, checked = row
+            expires = checked + (self._ttl if ok else self._negative_ttl)
+            if expires < time.time():
+                return None
+            entry = (json.loads(value), error)
+            self._remember(key, entry, expires)
+            return entry
+
+    def set(self, key, value, error='', ok=None):
+        """Stores the result of a check; `ok` chooses the ttl and defaults to bool(value)."""
+        if ok is None:
+            ok = bool(value)
+        with self._lock:
+            self._connect().execute(f'INSERT OR REPLACE INTO {self._table} (key, value, ok, error, checked) '
+                                    'VALUES (?, ?, ?, ?, ?)', (key, json.dumps(value), int(ok), error, time.time()))
+            self._remember(key, (value, error), time.time() + (self._ttl if ok else self._negative_ttl))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class SbomStream(object):
+    """Reads a JSON sbom keeping only one item of the top-level "components" array in memory.
+
+    Iterating yields the items of "components" one at a time; once the
+    iteration is over, `envelope` holds every other top-level key ("components"
+    itself is replaced by an empty list). A top level that is not an object is
+    no sbom: it is read whole into `envelope` and nothing is yielded.
+    """
+    def __init__(self, filename, pairs=False, chunk_size=STREAM_CHUNK_SIZE):
+        self.filename = filename
+        self.envelope = dict()
+        self._hook = validate_no_duplicate_keys if pairs else None
+        self._decoder = json.JSONDecoder(object_pairs_hook=self._hook)
+        self._chunk_size = chunk_size
+        self._file = None
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        # utf-8-sig reads files with and without the byte order mark
+        with open(self.filename, encoding='utf-8-sig') as self._file:
+            if self._peek() != '{':
+                self.envelope = self._value()
+                return
+            self._expect('{')
+            if self._peek() == '}':
+                return
+            while True:
+                key = self._value()
+                if key in self.envelope:
+                    raise ValueError(f'Duplicate key(s) in file: {key}')
+                self._expect(':')
+                if key == 'components' and self._peek() == '[':
+                    self.envelope[key] = []
+                    yield from self._array_items()
+                else:
+                    self.envelope[key] = self._value()
+                if self._peek() == ',':
+                    self._pos += 1
+                    continue
+                self._expect('}')
+                break
+
+    def _array_items(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect(']')
+            return
+
+    def _fill(self, size):
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        chunk = self._file.read(size)
+        if not chunk:
+            self._eof = True
+        self._buf += chunk
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in ' \t\n\r':
+                self._pos += 1
+            if self._pos < len(self._buf) or self._eof:
+                return self._buf[self._pos:self._pos + 1]
+            self._fill(self._chunk_size)
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise json.decoder.JSONDecodeError(f'Expecting {char!r}', self._buf, self._pos)
+        self._pos += 1
+
+    def _value(self):
+        self._peek()
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.decoder.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
 def load_cache():
-    cache_file = platformdirs.user_cache_path('sbom-checker', ensure_exists=True) / 'check_vcs.json'
-    if os.path.isfile(cache_file):
-        with open(cache_file) as f:
-            return json.load(f)
-    return dict()
-
-def dump_cache(data):
-    cache_file = platformdirs.user_cache_path('sbom-checker', ensure_exists=True) / 'check_vcs.json'
-    with open(cache_file, 'w') as f:
-        json.dump(data, f)
\ No newline at end of file
+    cache = ResultCache('check_vcs')
+    # results left by older versions in check_vcs.json are moved into the database
+    legacy_file = platformdirs.user_cache_path('sbom-checker', ensure_exists=True) / 'check_vcs.json'
+    if os.path.isfile(legacy_file):
+        try:
+            with open(legacy_file) as f:
+                for url, result in json.load(f).items():
+                    if cache.get(url) is None:
+                        cache.set(url, result)
+            os.remove(legacy_file)
+        except (OSError, ValueError):
+            pass
+    return cache
+
+def load_purl_cache():
+    """purl -> repository url found by sbom-updater; purls without a repository expire as negative results."""
+    return ResultCache('purl_to_vcs')
@@ -0,0 +1,244 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import deque, namedtuple
+import concurrent.futures
+import functools
+import hashlib
+import json
+import jsonschema
+import multiprocessing
+from pathlib import Path
+import re
+from referencing import Registry, Resource
+import threading
+
+from sbom_utils import SbomError
+
+BASE_DIR = Path(__file__).parent.resolve()
+# path of the components items in the sbom schema, used to report errors of separately validated components
+COMPONENT_SCHEMA_PATH = ('properties', 'components', 'items')
+SHARD_SIZE = 256 # items of "components" validated by a worker at once
+FORMAT_CACHE_SIZE = 65536 # (format, value) results kept by CachedFormatChecker
+
+# ASCII absolute uris without IP literals: a subset of what rfc3987 accepts as a URI and as an IRI reference
+_PCT = '%[0-9A-Fa-f]{2}'
+_CHARS = "A-Za-z0-9\\-._~!$&'()*+,;=" # unreserved and sub-delims
+_PCHAR = f'(?:[{_CHARS}:@]|{_PCT})'
+URI_FAST_RE = re.compile(
+    '[A-Za-z][A-Za-z0-9+.\\-]*:'
+    f'(?://(?:(?:[{_CHARS}:]|{_PCT})*@)?(?:[{_CHARS}]|{_PCT})*(?::[0-9]*)?(?:/{_PCHAR}*)*' # //authority/path
+    f'|/(?:{_PCHAR}+(?:/{_PCHAR}*)*)?' # /path
+    f'|{_PCHAR}+(?:/{_PCHAR}*)*' # path, e.g. of a purl
+    ')?'
+    f'(?:\\?(?:{_PCHAR}|[/?])*)?(?:#(?:{_PCHAR}|[/?])*)?')
+# formats whose checks parse the value (rfc3987, rfc3339) and are worth memoizing, with their fast accepting patterns
+CACHED_FORMATS = {
+    'uri': URI_FAST_RE,
+    'uri-reference': URI_FAST_RE,
+    'iri': URI_FAST_RE,
+    'iri-reference': URI_FAST_RE,
+    'date-time': None,
+}
+
+class FormatCacheInfo(namedtuple('FormatCacheInfo', 'hits misses fast maxsize currsize')):
+    """Statistics of CachedFormatChecker: hits and misses of the cache, misses accepted by a fast pattern."""
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class CachedFormatChecker(jsonschema.FormatChecker):
+    """The format checker of a validator class with the checks of CACHED_FORMATS memoized.
+
+    Results are kept in a bounded LRU cache per (format, value). A value that
+    is not in the cache yet is accepted at once if it matches the fast pattern
+    of its format, otherwise it goes to the original check. Every value is
+    accepted or rejected as by the original checker.
+    """
+    def __init__(self, format_checker, cache_size=FORMAT_CACHE_SIZE):
+        super().__init__(())
+        self.checkers = dict(format_checker.checkers)
+        self._fast = 0
+        self._error = functools.lru_cache(maxsize=cache_size)(self._check_error)
+
+    def _check_error(self, format, instance):
+        """FormatError of a value, None if it conforms."""
+        pattern = CACHED_FORMATS[format]
+        if pattern is not None and pattern.fullmatch(instance):
+            self._fast += 1
+            return None
+        try:
+            super().check(instance, format)
+        except jsonschema.exceptions.FormatError as e:
+            # the cached error must not keep the frames of the check alive
+            return jsonschema.exceptions.FormatError(e.message, cause=e.cause.with_traceback(None) if e.cause else None)
+        return None
+
+    def check(self, instance, format):
+        if not format in CACHED_FORMATS or not format in self.checkers or type(instance) != str:
+            super().check(instance, format)
+            return
+        error = self._error(format, instance)
+        if error is not None:
+            raise jsonschema.exceptions.FormatError(error.message, cause=error.cause)
+
+    def cache_info(self):
+        info = self._error.cache_info()
+        return FormatCacheInfo(info.hits, info.misses, self._fast, info.maxsize, info.currsize)
+
+# CachedFormatChecker of every validator class, shared by all validators of the process
+_format_checkers = dict()
+_format_checkers_lock = threading.Lock()
+
+def format_checker(cls):
+    with _format_checkers_lock:
+        if not cls in _format_checkers:
+            _format_checkers[cls] = CachedFormatChecker(cls.FORMAT_CHECKER)
+        return _format_checkers[cls]
+
+def format_cache_info():
+    """FormatCacheInfo summed over the format checkers of the process."""
+    with _format_checkers_lock:
+        infos = [checker.cache_info() for checker in _format_checkers.values()]
+    return FormatCacheInfo(*(sum(values) for values in zip(*infos))) if infos else FormatCacheInfo(0, 0, 0, 0, 0)
+
+def load_registry():
+    with open(BASE_DIR / 'additional_schemas' / "spdx.schema.json") as f:
+        resource1 = Resource.from_contents(json.load(f))
+    with open(BASE_DIR / 'additional_schemas' / "jsf-0.82.schema.json") as f:
+        resource2 = Resource.from_contents(json.load(f))
+    return Registry().with_resources(
+        [
+            ("spdx.schema.json", resource1),
+            ("jsf-0.82.schema.json", resource2),
+        ],
+    )
+
+def load_schema(sbom_format):
+    with open(BASE_DIR / 'schemas' / ('schema_container.json' if sbom_format == 'container' else 'schema.json')) as f:
+        return json.load(f)
+
+def component_schema(schema):
+    """The schema of one item of "components", with the definitions of the whole sbom schema."""
+    sub_schema = {key: schema[key] for key in ('$schema', '$defs') if key in schema}
+    sub_schema.update(schema['properties']['components']['items'])
+    return sub_schema
+
+def before_components(schema, err):
+    """Whether the validation of a whole sbom reports err, an error of the rest of the document,
+    before the errors of "components": the keywords of the schema and the names in its "properties"
+    are validated in their order.
+    """
+    keywords = list(schema)
+    position = lambda keyword: keywords.index(keyword) if keyword in keywords else len(keywords)
+    path = err.relative_schema_path
+    if len(path) < 2 or path[0] != 'properties':
+        return position(path[0] if path else None) < position('properties')
+    names = list(schema['properties'])
+    return names.index(path[1]) < names.index('components')
+
+def make_validator(schema, registry=None):
+    cls = jsonschema.validators.validator_for(schema)
+    cls.check_schema(schema)
+    if registry:
+        return cls(schema, format_checker=format_checker(cls), registry=registry)
+    return cls(schema, format_checker=format_checker(cls))
+
+def iter_component_errors(validator, component, idx):
+    """Validates one item of "components" against the component validator,
+    error paths are reported as if the whole sbom was validated.
+    """
+    for err in validator.iter_errors(component):
+        err.relative_path.extendleft(reversed(('components', idx)))
+        err.relative_schema_path.extendleft(reversed(COMPONENT_SCHEMA_PATH))
+        yield err
+
+def component_digest(component):
+    """Digest used to find repeated items of "components" without keeping them in memory."""
+    return hashlib.sha1(json.dumps(component, sort_keys=True, ensure_ascii=False).encode()).digest()
+
+def format_non_unique(instance_path, dups):
+    return f'ERROR: {instance_path} non-unique elements:\n' + '\n'.join([str(x) for x in dups])
+
+def format_error(err):
+    if err.message.endswith(' has non-unique elements'):
+        arr = err.instance
+        dups = []
+        for n, i in enumerate(arr):
+            if i in arr[n+1:] and not i in dups:
+                dups.append(i)
+        inst = ''
+        for line in str(err).split('\n'):
+            if line.startswith('On instance'):
+                inst = line[:-1]
+                break
+        return format_non_unique(inst, dups)
+    elif err.message.startswith('Additional properties are not allowed'):
+        return f'ERROR: {err.message}\n\nOn {jsonschema.exceptions._pretty(err.instance, 16 * " ")}'
+    return "ERROR: " + str(err)
+
+def sbom_error(err):
+    """SbomError of a ValidationError."""
+    return SbomError(format_error(err), tuple(err.absolute_path))
+
+# validator of the worker process, built once by _init_worker
+_worker_validator = None
+_worker_stop = None
+
+def _init_worker(sbom_format, stop):
+    global _worker_validator, _worker_stop
+    _worker_validator = make_validator(component_schema(load_schema(sbom_format)), load_registry())
+    _worker_stop = stop
+
+def _validate_shard(start, components, limit):
+    errors = []
+    for offset, component in enumerate(components):
+        if _worker_stop.is_set():
+            break
+        for err in iter_component_errors(_worker_validator, component, start + offset):
+            errors.append(sbom_error(err))
+            if limit and len(errors) >= limit:
+                return errors
+    return errors
+
+class ShardedValidator(object):
+    """Validates items of "components" in worker processes shard by shard.
+
+    SbomErrors are yielded in document order. Once the consumer stops
+    iterating (e.g. the error limit is reached) the workers stop as well.
+    """
+    def __init__(self, sbom_format, jobs, limit=0, shard_size=SHARD_SIZE):
+        self._format = sbom_format
+        self._jobs = jobs
+        self._limit = limit
+        self._shard_size = shard_size
+
+    def _shards(self, components):
+        shard = []
+        start = 0
+        for component in components:
+            shard.append(component)
+            if len(shard) == self._shard_size:
+                yield start, shard
+                start += len(shard)
+                shard = []
+        if shard:
+            yield start, shard
+
+    def iter_errors(self, components):
+        stop = multiprocessing.Event()
+        pending = deque()
+        with concurrent.futures.ProcessPoolExecutor(self._jobs, initializer=_init_worker, initargs=(self._format, stop)) as executor:
+            try:
+                for start, shard in self._shards(components):
+                    pending.append(executor.submit(_validate_shard, start, shard, self._limit))
+                    # a few shards per worker in flight keep memory bounded when components are streamed
+                    while len(pending) > 2 * self._jobs:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                stop.set()
+                for future in pending:
+                    future.cancel()
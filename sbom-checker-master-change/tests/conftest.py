@@ -0,0 +1,12 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# The tools and the benchmark helpers (stand-in servers, the previous parse_repo_url) are plain
+# modules next to the scripts, not a package.
+
+from pathlib import Path
+import sys
+
+BASE_DIR = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(BASE_DIR / 'benchmarks'))
+sys.path.insert(0, str(BASE_DIR))
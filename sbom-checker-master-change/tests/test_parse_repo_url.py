@@ -0,0 +1,61 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# parse_repo_url must give the same results as the implementation it replaced.
+
+import pytest
+
+from bench_parse_repo_url import legacy_parse_repo_url, make_urls
+from sbom_utils import parse_repo_url, parse_repo_urls, RepoUrlNormalizer
+
+URLS = [
+    'https://github.com/org/repo',
+    'https://github.com/org/repo/',
+    'https://github.com/org/repo/tree/main/lib',
+    'https://github.com/org/repo/blob/v1.0/README.md',
+    'https://github.com/org/repo/commit/abc',
+    'https://github.com/org/repo/releases/tag/v1.0',
+    'https://gitlab.com/group/sub/repo/-/tree/main',
+    'https://gitlab.com/group/repo/-/tags/v1.0',
+    'https://bitbucket.org/org/repo/src/main/lib',
+    'https://codeberg.org/org/repo/src/branch/main',
+    'https://opendev.org/org/repo/src/tag/v1.0',
+    'https://hg.code.sf.net/p/proj/code/file/tip/README',
+    'https://hg.openjdk.org/jdk/jdk/rev/abc',
+    'https://src.libcode.org/org/repo/src/main',
+    'https://git.altlinux.org/gears/p/pkg.git?p=pkg.git;a=blob;f=a/b.c;hb=v2',
+    'https://git.altlinux.org/gears/p/pkg.git?p=pkg.git;a=commit;h=deadbeef',
+    'https://git.altlinux.org/gears/p/pkg.git?p=pkg.git;a=tree;f=src',
+    'https://git.netfilter.org/iptables',
+    'https://git.netfilter.org/iptables/commit/?id=1234',
+    'https://git.netfilter.org/iptables/tree/extensions/libxt_tcp.c?h=v1.8',
+    'https://example.org/repo?commit=abc',
+    'https://example.org/repo?tag=v1',
+    'https://example.org/org/repo/-/blob/main/x',
+    'https://example.org/',
+    'https://example.org',
+    'git+ssh://git@github.com/org/repo.git',
+]
+
+@pytest.mark.parametrize('url', URLS)
+def test_known_urls(url):
+    assert parse_repo_url(url) == legacy_parse_repo_url(url)
+
+@pytest.mark.parametrize('seed', range(3))
+def test_generated_urls(seed):
+    urls = set(make_urls(5000, 5000, seed))
+    normalizer = RepoUrlNormalizer(cache_size=0)
+    mismatches = [url for url in urls if normalizer.normalize(url) != legacy_parse_repo_url(url)]
+    assert mismatches == []
+
+def test_cache_returns_same_results():
+    urls = make_urls(2000, 200, 0)
+    normalizer = RepoUrlNormalizer()
+    expected = {url: legacy_parse_repo_url(url) for url in urls}
+    assert normalizer.normalize_many(urls) == expected
+    # the second time every url comes from the cache
+    assert normalizer.normalize_many(urls) == expected
+    assert normalizer.cache_info().hits == len(expected)
+
+def test_parse_repo_urls():
+    assert parse_repo_urls(URLS) == {url: legacy_parse_repo_url(url) for url in URLS}
@@ -0,0 +1,77 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# Purl resolution of sbom-updater --ref against the registry stand-ins of benchmarks/stand_ins.py:
+# resolving in threads beforehand must give the answers of resolving purl by purl.
+
+import http.server
+
+import pytest
+import requests
+
+import sbom_update
+from sbom_update import RefFinder
+from stand_ins import _bucket, start_stand_ins
+
+NAMES = [f'pkg{i}' for i in range(16)]
+# ecosyste.ms knows nothing about a quarter of the packages, nuget and rubygems are asked for those
+PURLS = [f'pkg:npm/{name}@1.0' for name in NAMES] + \
+        [f'pkg:nuget/{name}@1.0' for name in NAMES[::2]] + \
+        [f'pkg:gem/{name}@1.0' for name in NAMES[1::2]]
+
+@pytest.fixture(scope='module')
+def stand_ins():
+    server, base = start_stand_ins()
+    yield base
+    server.shutdown()
+
+@pytest.fixture
+def registries(monkeypatch, tmp_path, stand_ins):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setattr(sbom_update, 'ECOSYSTEMS_API', f'{stand_ins}/eco')
+    monkeypatch.setattr(sbom_update, 'NUGET_INDEX', f'{stand_ins}/nuget/index.json')
+    monkeypatch.setattr(sbom_update, 'RUBYGEMS_API', f'{stand_ins}/rubygems')
+    return stand_ins
+
+def resolved(finder, purls, urls=()):
+    try:
+        finder.resolve(purls, urls)
+        return {purl: finder.process_purl(purl) for purl in purls}, {url: finder.is_repo(url) for url in urls}
+    finally:
+        finder.close()
+
+def test_threads_resolve_like_serial(monkeypatch, tmp_path, registries):
+    urls = [f'{registries}/git/{name}' for name in NAMES]
+    expected = resolved(RefFinder(jobs=1), PURLS, urls)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'other-cache'))
+    assert resolved(RefFinder(jobs=8), PURLS, urls) == expected
+
+    purl_to_url, repos = expected
+    for name in NAMES:
+        found = purl_to_url[f'pkg:npm/{name}@1.0']
+        if _bucket(name) == 2:
+            assert found == f'{registries}/git/{name}'
+        else:
+            assert found.startswith('sbom-updater_generated_placeholder:')
+        assert repos[f'{registries}/git/{name}'] == (_bucket(name) != 3)
+    # the registries of the packages ecosyste.ms doesn't know
+    fallback = [purl for purl in PURLS[len(NAMES):] if _bucket(purl.split('/')[1].split('@')[0]) == 0]
+    assert {purl.split('/')[0] for purl in fallback} == {'pkg:nuget', 'pkg:gem'}
+    for purl in fallback:
+        assert purl_to_url[purl] == f"{registries}/git/{purl.split('/')[1].split('@')[0]}"
+
+def test_results_are_cached(monkeypatch, registries):
+    expected, _ = resolved(RefFinder(jobs=8), PURLS)
+    # the second run answers from the purl cache without asking the registries
+    monkeypatch.setattr(RefFinder, '_get', lambda self, url: pytest.fail(f'request to {url}'))
+    assert resolved(RefFinder(jobs=8), PURLS) == (expected, {})
+
+@pytest.mark.parametrize('jobs', [1, 8])
+def test_registry_errors_propagate(monkeypatch, tmp_path, jobs):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    # nothing listens on the port of a closed server
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), http.server.BaseHTTPRequestHandler)
+    server.server_close()
+    monkeypatch.setattr(sbom_update, 'ECOSYSTEMS_API', f'http://127.0.0.1:{server.server_address[1]}/eco')
+    with pytest.raises(requests.exceptions.ConnectionError):
+        resolved(RefFinder(jobs=jobs), PURLS[:4])
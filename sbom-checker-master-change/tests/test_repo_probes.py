@@ -0,0 +1,130 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# Repository probes against local servers: the stand-ins of benchmarks/stand_ins.py for git
+# smart HTTP and a small server for the other answers a probe has to tell apart.
+
+import http.server
+import threading
+import time
+
+import pytest
+
+import sbom_utils
+from sbom_utils import check_repos, GitHttpProber
+from stand_ins import _bucket, start_stand_ins
+
+# stand-in packages with a repository and without one (the stand-ins answer 404 for a quarter of the names)
+REPOS = [name for name in (f'pkg{i}' for i in range(40)) if _bucket(name) != 3][:5]
+NOT_REPOS = [name for name in (f'pkg{i}' for i in range(40)) if _bucket(name) == 3][:3]
+
+class AnswerHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # path prefix: (status, content type, body)
+    answers = {
+        '/dumb/': (200, 'text/plain', b'0123456789abcdef0123456789abcdef01234567\trefs/heads/main\n'),
+        '/page/': (200, 'text/html', b'<html>not a repository</html>'),
+        '/error/': (500, 'text/plain', b'error'),
+        '/empty/': (200, 'text/plain', b''),
+    }
+
+    def do_GET(self):
+        self.server.clients.add(self.client_address)
+        status, ctype, body = next((answer for prefix, answer in self.answers.items() if self.path.startswith(prefix)),
+                                   (404, 'text/plain', b'not found'))
+        self.send_response(status)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope='module')
+def stand_ins():
+    server, base = start_stand_ins()
+    yield base
+    server.shutdown()
+
+@pytest.fixture
+def answers():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), AnswerHandler)
+    server.daemon_threads = True
+    server.clients = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+def test_smart_http(stand_ins):
+    prober = GitHttpProber()
+    for name in REPOS:
+        assert prober.probe(f'{stand_ins}/git/{name}') == (True, '')
+    for name in NOT_REPOS:
+        is_git, error = prober.probe(f'{stand_ins}/git/{name}')
+        assert is_git is False and 'HTTP 404' in error
+
+@pytest.mark.parametrize('path, expected', [('dumb', True), ('page', False), ('error', None), ('empty', None)])
+def test_other_answers(answers, path, expected):
+    is_git, error = GitHttpProber().probe(f'http://127.0.0.1:{answers.server_address[1]}/{path}/repo')
+    assert is_git is expected
+    assert bool(error) == (expected is not True)
+
+def test_connections_are_reused(answers):
+    prober = GitHttpProber()
+    for i in range(10):
+        assert prober.probe(f'http://127.0.0.1:{answers.server_address[1]}/dumb/repo{i}')[0]
+    assert len(answers.clients) == 1
+
+def test_unreachable_server():
+    # nothing listens on the port of a closed server
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), AnswerHandler)
+    port = server.server_address[1]
+    server.server_close()
+    assert GitHttpProber().probe(f'http://127.0.0.1:{port}/repo')[0] is None
+
+def test_check_repos(stand_ins):
+    urls = [f'{stand_ins}/git/{name}' for name in REPOS + NOT_REPOS]
+    results = check_repos(urls)
+    assert list(results) == urls
+    for name in REPOS:
+        assert results[f'{stand_ins}/git/{name}'] == (True, '')
+    for name in NOT_REPOS:
+        ok, error = results[f'{stand_ins}/git/{name}']
+        # the answer of the server settles git, the other protocols are still probed
+        assert not ok and error.startswith('ERROR/GIT: ') and 'HTTP 404' in error and 'ERROR/SVN' in error
+
+def test_first_successful_probe_wins(monkeypatch):
+    monkeypatch.setattr(sbom_utils, 'PROBES', (('GIT', 'sleep 30', None), ('SVN', 'exit 0', None)))
+    start = time.perf_counter()
+    assert check_repos(['ssh://127.0.0.1/repo']) == {'ssh://127.0.0.1/repo': (True, '')}
+    # the slow probe is killed, not waited for
+    assert time.perf_counter() - start < 10
+
+def test_errors_in_protocol_order(monkeypatch):
+    monkeypatch.setattr(sbom_utils, 'PROBES', (('GIT', 'sleep 0.5; echo git >&2; exit 1', None),
+                                               ('SVN', 'echo svn >&2; exit 1', None),
+                                               ('FOSSIL', 'echo no', 'footer')))
+    ok, error = check_repos(['ssh://127.0.0.1/repo'])['ssh://127.0.0.1/repo']
+    assert not ok
+    assert error == ("ERROR/GIT: git\n\nERROR/SVN: svn\n\n"
+                     "ERROR/FOSSIL: didn't find autogenerated fossil footer on this page")
+
+def test_marker_probe(monkeypatch):
+    monkeypatch.setattr(sbom_utils, 'PROBES', (('FOSSIL', 'echo footer', 'footer'),))
+    assert check_repos(['ssh://127.0.0.1/repo']) == {'ssh://127.0.0.1/repo': (True, '')}
+
+# a url with shell syntax in it must reach the probe command as one unchanged argument
+UNSAFE_URL = "ssh://127.0.0.1/x;echo injected;$(echo injected) 'a b' `echo injected`"
+
+@pytest.mark.parametrize('cmd', [('printf', 'url=%s', '{url}'), 'printf url=%s {url}'])
+def test_url_is_one_argument(monkeypatch, cmd):
+    monkeypatch.setattr(sbom_utils, 'PROBES', (('FOSSIL', cmd, f'url={UNSAFE_URL}'),))
+    assert check_repos([UNSAFE_URL]) == {UNSAFE_URL: (True, '')}
+
+def test_url_is_not_run(tmp_path):
+    # file urls fail at once without the network; the probe clients that are not installed fail as well
+    url = f'file://{tmp_path}/x;touch {tmp_path}/a;$(touch {tmp_path}/b) `touch {tmp_path}/c`'
+    ok, error = check_repos([url])[url]
+    assert not ok and error.startswith('ERROR/GIT: ')
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,69 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+# sbom-checker results for documents the schema rejects: the checks after the schema check must skip
+# the invalid values instead of failing on them.
+
+import json
+
+import pytest
+
+from sbom_check import SbomChecker
+
+HEAD = {'bomFormat': 'CycloneDX', 'specVersion': '1.6', 'version': 1}
+
+def sbom_file(tmp_path, data):
+    # --stream reads a file
+    path = tmp_path / 'sbom.json'
+    path.write_text(json.dumps(data))
+    return str(path)
+
+@pytest.fixture(scope='module')
+def checker():
+    checker = SbomChecker()
+    yield checker
+    checker.close()
+
+@pytest.mark.parametrize('stream', [False, True])
+@pytest.mark.parametrize('extra, message', [
+    ({'services': 5}, "5 is not of type 'array'"),
+    ({'services': [{'name': 's', 'services': 5}, 7]}, "7 is not of type 'object'"),
+    ({'services': {'name': 's'}}, "is not of type 'array'"),
+    ({'metadata': {'component': {'type': 'library', 'name': 'm', 'components': 5}}}, "5 is not of type 'array'"),
+])
+def test_invalid_values_are_schema_errors(checker, tmp_path, stream, extra, message):
+    result = checker.check(sbom_file(tmp_path, dict(HEAD, **extra)), errors=0, stream=stream)
+    assert not result.correct
+    assert any(message in error.message for error in result.errors)
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_nested_services_declare_bom_refs(checker, tmp_path, stream):
+    services = [{'name': 's', 'bom-ref': 'x'}, {'name': 't', 'services': [{'name': 'u', 'bom-ref': 'x'}]}]
+    result = checker.check(sbom_file(tmp_path, dict(HEAD, services=services)), errors=0, stream=stream)
+    duplicates = [error for error in result.errors if 'не уникален' in error.message]
+    assert len(duplicates) == 1
+    assert duplicates[0].path in (('services', 0), ('services', 1, 'services', 0))
+
+def invalid_sbom(count):
+    # errors of the top level before and after "components" in the schema, and in the components
+    components = [{'type': 'bogus' if i % 2 else 'library', 'name': f'c{i}', 'version': '1'} for i in range(count)]
+    components.append(dict(components[1]))
+    return {'extra': 1, 'bomFormat': 'Cyclone', 'specVersion': '1.6', 'serialNumber': 'bad',
+            'metadata': {'timestamp': 'yesterday'}, 'components': components, 'services': 5, 'version': 'x'}
+
+@pytest.mark.parametrize('errors', [0, 3, 10])
+def test_jobs_report_errors_in_order(checker, tmp_path, errors):
+    path = sbom_file(tmp_path, invalid_sbom(100))
+    expected = [(error.message, error.path) for error in checker.check(path, errors=errors).errors]
+    assert [(error.message, error.path) for error in checker.check(path, errors=errors, jobs=2).errors] == expected
+    assert expected[0][0].startswith("ERROR: Additional properties are not allowed ('extra' was unexpected)")
+
+@pytest.mark.parametrize('jobs', [1, 2])
+@pytest.mark.parametrize('errors', [0, 3, 10])
+def test_stream_reports_errors_in_order(checker, tmp_path, jobs, errors):
+    data = invalid_sbom(100)
+    # the top-level keys after "components" in the file are known only at its end
+    data = dict(components=data.pop('components'), **data)
+    path = sbom_file(tmp_path, data)
+    expected = [error.path for error in checker.check(path, errors=errors).errors]
+    assert [error.path for error in checker.check(path, errors=errors, stream=True, jobs=jobs).errors] == expected
@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+"""Single entry point for the ToolBelt scripts:
+toolbelt.py [--profile FILE] <command> [<subcommand>] [options].
+
+Only the script of the requested command is loaded, so its dependencies
+(scapy, jsonschema, requests) are imported when that command runs and
+never for the others or for the command list. With --profile the stages
+of the run are measured (see toolbelt_profile.py) and saved to FILE as JSON.
+"""
+
+import os
+import runpy
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SBOM_DIR = os.path.join(BASE_DIR, 'sbom-checker-master-change')
+
+# command: (script, description) or {subcommand: (script, description)}
+COMMANDS = {
+    'pcap': (os.path.join(BASE_DIR, 'pcap-checker', 'pcap-checker.py'), 'анализ IP-адресов в pcap-файлах'),
+    'sarif': (os.path.join(BASE_DIR, 'sarif-checker', 'sarif-checker.py'), 'анализ комментариев в SARIF-файлах'),
+    'sbom': {
+        'check': (os.path.join(SBOM_DIR, 'sbom-checker.py'), 'проверка sbom-файлов'),
+        'check-server': (os.path.join(SBOM_DIR, 'sbom-check-server.py'), 'сервер проверки sbom-файлов'),
+        'update': (os.path.join(SBOM_DIR, 'sbom-updater.py'), 'изменение sbom-файлов'),
+        'unify': (os.path.join(SBOM_DIR, 'sbom-unifier.py'), 'объединение sbom-файлов'),
+        'csv': (os.path.join(SBOM_DIR, 'sbom-to-csv.py'), 'генератор таблицы компонентов в формате csv'),
+        'odt': (os.path.join(SBOM_DIR, 'sbom-to-odt.py'), 'генератор таблицы компонентов в формате odt'),
+        'export': (os.path.join(SBOM_DIR, 'sbom-export.py'), 'генератор таблиц в нескольких форматах за одно чтение'),
+        'registry-import': (os.path.join(SBOM_DIR, 'sbom-registry-import.py'), 'импорт метаданных реестров пакетов'),
+    },
+}
+
+def usage(commands, prog):
+    lines = [f'usage: {prog} [--profile FILE] <команда> [параметры]', '', 'команды:']
+    for name, command in commands.items():
+        if type(command) == dict:
+            for sub, (script, description) in command.items():
+                lines.append(f'  {name + " " + sub:22}{description}')
+        else:
+            lines.append(f'  {name:22}{command[1]}')
+    lines += ['', 'параметры:',
+              f'  {"--profile FILE":22}сохранить в FILE время работы, время процессора, число вызовов и пиковый расход памяти',
+              f'  {"":22}по этапам, а также гистограммы задержек обращений к серверам и подпроцессам (JSON)',
+              '', f'справка по команде: {prog} <команда> --help']
+    return '\n'.join(lines)
+
+def resolve(argv):
+    """Returns (script, arguments of the script) for the command line, or None."""
+    commands = COMMANDS
+    while argv and argv[0] in commands:
+        command = commands[argv[0]]
+        argv = argv[1:]
+        if type(command) != dict:
+            return command[0], argv
+        commands = command
+    return None
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    profile_file = None
+    if argv[:1] == ['--profile'] and len(argv) > 1:
+        profile_file, argv = argv[1], argv[2:]
+    elif argv and argv[0].startswith('--profile='):
+        profile_file, argv = argv[0].split('=', 1)[1], argv[1:]
+    found = resolve(argv)
+    if found is None:
+        # `toolbelt sbom` lists the sbom subcommands only
+        if argv and type(COMMANDS.get(argv[0])) == dict:
+            commands, prog, rest = COMMANDS[argv[0]], 'toolbelt ' + argv[0], argv[1:]
+        else:
+            commands, prog, rest = COMMANDS, 'toolbelt', argv
+        if rest in (['-h'], ['--help']):
+            print(usage(commands, prog))
+            return 0
+        print(usage(commands, prog), file=sys.stderr)
+        if rest:
+            print(f'{prog}: неизвестная команда: {rest[0]}', file=sys.stderr)
+        return 2
+    script, args = found
+    if profile_file:
+        import toolbelt_profile
+        toolbelt_profile.enable()
+    # the script runs as if started directly, with its own directory importable
+    sys.argv = [script] + args
+    sys.path.insert(0, os.path.dirname(script))
+    try:
+        runpy.run_path(script, run_name='__main__')
+    finally:
+        if profile_file:
+            # written on sys.exit() and errors too, they are the runs worth looking at
+            toolbelt_profile.write_summary(profile_file, argv)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
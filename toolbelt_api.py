@@ -0,0 +1,115 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+"""The ToolBelt tools as functions, for programs handling many files in one process.
+
+    import toolbelt_api
+    result = toolbelt_api.check_sbom('bom.json')
+    for error in result.errors:
+        print(error.json_path, error.message)
+
+Inputs are file names or documents already in memory, results are
+namedtuples and objects instead of printed text:
+
+analyze_pcap(file, white_list)      PcapResult
+count_sarif_comments(source)        SarifResult
+check_sbom(source, ...)             CheckResult with SbomErrors and VcsFailures (sbom_check.py)
+update_sbom(source, ...)            UpdateResult (sbom_update.py)
+unify_sboms(sources, ...)           UnifyResult (sbom_unify.py)
+export_sbom(source, ...)            names of the written files (sbom_export.py)
+
+As with toolbelt.py, the modules of a tool and its dependencies (scapy,
+jsonschema, requests) are imported on the first use of the tool.
+"""
+
+from collections import Counter, namedtuple
+import importlib
+import importlib.util
+import json
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SBOM_DIR = os.path.join(BASE_DIR, 'sbom-checker-master-change')
+
+# ip addresses of a pcap file: all of them, those of the white list with their comments, the rest,
+# and the groups of the rest (of all of them without a white list) by range as in the report
+PcapResult = namedtuple('PcapResult', 'file unique_ips white_ips non_white_ips groups error')
+# comments of a sarif file with their numbers of occurrences; file is None for a document in memory
+SarifResult = namedtuple('SarifResult', 'file comments error')
+
+# name: module of the sbom tools defining it
+SBOM_API = {
+    'check_sbom': 'sbom_check',
+    'CheckResult': 'sbom_check',
+    'SbomChecker': 'sbom_check',
+    'VcsFailure': 'sbom_check',
+    'SbomError': 'sbom_utils',
+    'update_sbom': 'sbom_update',
+    'UpdateResult': 'sbom_update',
+    'unify_sboms': 'sbom_unify',
+    'UnifyResult': 'sbom_unify',
+    'export_sbom': 'sbom_export',
+}
+
+__all__ = ['analyze_pcap', 'count_sarif_comments', 'load_white_list', 'PcapResult', 'SarifResult'] + list(SBOM_API)
+
+_scripts = dict()
+
+def _script(name, path):
+    # the scripts have hyphens in their names, so they are loaded by path, once
+    if not name in _scripts:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _scripts[name] = module
+    return _scripts[name]
+
+def _pcap_checker():
+    return _script('pcap_checker', os.path.join(BASE_DIR, 'pcap-checker', 'pcap-checker.py'))
+
+def _sarif_checker():
+    return _script('sarif_checker', os.path.join(BASE_DIR, 'sarif-checker', 'sarif-checker.py'))
+
+def __getattr__(name):
+    # the sbom functions and types are imported from their modules on first access
+    if not name in SBOM_API:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    if not SBOM_DIR in sys.path:
+        sys.path.insert(0, SBOM_DIR)
+    value = getattr(importlib.import_module(SBOM_API[name]), name)
+    globals()[name] = value
+    return value
+
+def load_white_list(filename):
+    """White list of pcap-checker.py --white-list: {ip: comment}."""
+    return _pcap_checker().load_white_list(filename)
+
+def analyze_pcap(file_path, white_list=None):
+    """Ip addresses of a pcap file as PcapResult; white_list is a file name or {ip: comment} of load_white_list."""
+    pcap_checker = _pcap_checker()
+    if isinstance(white_list, (str, os.PathLike)):
+        white_list = pcap_checker.load_white_list(white_list)
+    result = pcap_checker.process_pcap(file_path, white_list)
+    if result['error']:
+        return PcapResult(file_path, None, None, None, None, result['error'])
+    grouped = result['non_white_ips'] if white_list else result['unique_ips']
+    return PcapResult(file_path, result['unique_ips'], result['white_ips'], result['non_white_ips'],
+                      pcap_checker.group_ips_by_range(grouped), None)
+
+def count_sarif_comments(source):
+    """Comments of a sarif file (a file name or the parsed document) as SarifResult, a Counter of comments."""
+    sarif_checker = _sarif_checker()
+    file_path = None
+    data = source
+    if not isinstance(source, (dict, list)):
+        file_path = source
+        try:
+            with sarif_checker.stage('parse_sarif'), open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            return SarifResult(file_path, None, str(e))
+    with sarif_checker.stage('extract_comments'):
+        comments = []
+        sarif_checker.extract_comments(data, comments)
+    return SarifResult(file_path, Counter(comments), None)
@@ -0,0 +1,149 @@
+# SPDX-FileCopyrightText: 2024 Ekaterina Shastun, ISPRAS
+# SPDX-License-Identifier: Apache-2.0
+
+"""Stage timing for toolbelt.py --profile.
+
+The tools mark their stages with `with stage('name'):` and single network or
+subprocess calls with `with probe('http'):`. Until enable() is called both
+return one shared no-op context manager, so the marks cost a function call.
+When enabled, every stage accumulates wall time, CPU time of the process and
+the number of calls. ru_maxrss is the high-water mark of the whole process,
+so a stage keeps it at the stage end as process_peak_rss_mb, and how much the
+stage raised it as peak_rss_growth_mb (0 unless the stage set a new peak).
+Every probe kind accumulates a latency histogram. write_summary() saves it
+all as JSON.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# upper bounds of the latency histogram buckets, in milliseconds; slower probes go to the last bucket
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+_profile = None
+
+class _NoOp(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_OP = _NoOp()
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # kilobytes on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+class _Stage(object):
+    def __init__(self, profile, name):
+        self._profile = profile
+        self._name = name
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._peak = peak_rss_mb()
+        return self
+
+    def __exit__(self, *exc):
+        self._profile.add_stage(self._name, time.perf_counter() - self._wall, time.process_time() - self._cpu, self._peak)
+        return False
+
+class _Probe(object):
+    def __init__(self, profile, kind):
+        self._profile = profile
+        self._kind = kind
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self._profile.add_probe(self._kind, time.perf_counter() - self._start, exc_type is not None)
+        return False
+
+class Profile(object):
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time()
+        self.stages = dict()
+        self.probes = dict()
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, wall, cpu, peak_before):
+        rss = peak_rss_mb()
+        with self._lock:
+            entry = self.stages.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'process_peak_rss_mb': None,
+                                                  'peak_rss_growth_mb': None})
+            entry['calls'] += 1
+            entry['wall_s'] += wall
+            entry['cpu_s'] += cpu
+            if rss is not None:
+                entry['process_peak_rss_mb'] = max(entry['process_peak_rss_mb'] or 0, rss)
+                # concurrent stages raise the same peak, each of them is charged with the growth
+                entry['peak_rss_growth_mb'] = max(entry['peak_rss_growth_mb'] or 0, rss - peak_before)
+
+    def add_probe(self, kind, seconds, failed):
+        ms = seconds * 1000
+        bucket = next((i for i, bound in enumerate(BUCKETS_MS) if ms <= bound), len(BUCKETS_MS) - 1)
+        with self._lock:
+            entry = self.probes.get(kind)
+            if entry is None:
+                entry = self.probes[kind] = {'calls': 0, 'errors': 0, 'total_s': 0.0, 'max_ms': 0.0,
+                                             'histogram': [0] * len(BUCKETS_MS)}
+            entry['calls'] += 1
+            entry['errors'] += failed
+            entry['total_s'] += seconds
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            entry['histogram'][bucket] += 1
+
+    def summary(self, argv=None):
+        with self._lock:
+            stages = {name: dict(entry, wall_s=round(entry['wall_s'], 6), cpu_s=round(entry['cpu_s'], 6))
+                      for name, entry in self.stages.items()}
+            probes = dict()
+            for kind, entry in self.probes.items():
+                probes[kind] = dict(entry, total_s=round(entry['total_s'], 6), max_ms=round(entry['max_ms'], 3),
+                                    mean_ms=round(entry['total_s'] * 1000 / entry['calls'], 3),
+                                    histogram={f'<={bound}ms': count for bound, count in zip(BUCKETS_MS, entry['histogram'])})
+        return {
+            'argv': argv if argv is not None else sys.argv,
+            'pid': os.getpid(),
+            'wall_s': round(time.perf_counter() - self.started, 6),
+            'cpu_s': round(time.process_time() - self.started_cpu, 6),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': stages,
+            'probes': probes,
+        }
+
+def enable():
+    global _profile
+    if _profile is None:
+        _profile = Profile()
+    return _profile
+
+def enabled():
+    return _profile is not None
+
+def stage(name):
+    """Context manager measuring a named stage; nested and concurrent stages are measured separately."""
+    return _Stage(_profile, name) if _profile is not None else _NO_OP
+
+def probe(kind):
+    """Context manager measuring one call to a server or a subprocess, e.g. probe('http')."""
+    return _Probe(_profile, kind) if _profile is not None else _NO_OP
+
+def write_summary(filename, argv=None):
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(_profile.summary(argv), f, indent=2, ensure_ascii=False)